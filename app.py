@@ -1,15 +1,63 @@
-import sys, subprocess
+import sys, asyncio, subprocess
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from backend.ml_model import load_model
-from backend.routes import report, sos, rescue_agencies
+from backend.ml_model import load_model, model_info
+from backend.database import ensure_indexes, ensure_agency_indexes, sos_alerts_collection, reports_collection
+from backend.sos_stats import sos_stats
+from backend.sos_broadcast import sos_hub
+from backend.sos_journal import sos_journal
+from backend.sos_dedup import sos_dedup
+from backend.agency_index import agency_index
+from backend.agency_directory import agency_directory
+from backend.heatmap import heatmap
+from backend.location_buffer import location_buffer
+from backend.location_history import location_history
+from backend.batch_classifier import classifier
+from backend.uploads import UploadSizeLimitMiddleware
+from backend.routes import report, sos, rescue_agencies, classify, media, heatmap as heatmap_routes
+
+# Startup work that runs in the background; held here so the tasks aren't garbage-collected
+background_tasks: set[asyncio.Task] = set()
+
+def _task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Startup task {task.get_name()} failed: {task.exception()}")
+
+def spawn(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_model()
+    await classifier.start()
+    # Don't hold up startup if MongoDB is slow or down
+    spawn(ensure_indexes(), "ensure_indexes")
+    await sos_journal.start(sos_alerts_collection)
+    spawn(sos_dedup.seed(sos_alerts_collection, list(sos_journal.backlog)), "sos_dedup.seed")
+    sos_stats.start(sos_alerts_collection)
+    spawn(agency_index.load(rescue_agencies.agencies_collection), "agency_index.load")
+    agency_directory.start(rescue_agencies.agencies_collection)
+    spawn(ensure_agency_indexes(rescue_agencies.agencies_collection), "ensure_agency_indexes")
+    await location_buffer.start(rescue_agencies.agencies_collection)
+    location_history.start(rescue_agencies.agencies_collection.database["agency_location_history"])
+    heatmap.start({"sos": sos_alerts_collection, "reports": reports_collection})
     subprocess.Popen([sys.executable, "backend/ML/disaster_response_api.py"])
     yield
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    sos_hub.close()
+    await classifier.stop()
+    await sos_stats.stop()
+    await sos_journal.stop()
+    await heatmap.stop()
+    await location_buffer.stop()
+    await location_history.stop()
     print("🛑 Application shutting down")
 
 app = FastAPI(
@@ -18,6 +66,7 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +77,9 @@ app.add_middleware(
 
 app.include_router(report.router)
 app.include_router(sos.router)
+app.include_router(classify.router, tags=["classify"])
+app.include_router(media.router, tags=["media"])
+app.include_router(heatmap_routes.router, tags=["heatmap"])
 app.include_router(rescue_agencies.router, prefix="/rescue-agencies", tags=["rescue-agencies"])
 
 @app.get("/")
@@ -40,7 +92,11 @@ async def root():
             "health": "/health",
             "docs": "/docs",
             "sos": "/sos",
+            "sos_stream": "/sos/stream",
             "reports": "/reports",
+            "classify_stream": "/classify/stream",
+            "media": "/media/{hash}",
+            "heatmap": "/heatmap",
             "rescue_agencies": "/rescue-agencies"
         }
     }
@@ -51,7 +107,7 @@ async def favicon():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Disaster Management API is running"}
+    return {"status": "healthy", "message": "Disaster Management API is running", "model": model_info, "sos_stream": sos_hub.stats(), "sos_journal": sos_journal.status(), "sos_dedup": sos_dedup.status()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,51 @@
+import sys, time, asyncio, argparse
+import pandas as pd
+from pathlib import Path
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
+DATA_PATH = BASE_DIR / "dependencies" / "raw-data" / "test.csv"
+sys.path.insert(0, str(BASE_DIR))
+
+from backend import ml_model
+from backend.batch_classifier import BatchClassifier
+
+async def per_call(texts):
+    # Current /report path: one blocking predict per request on the event loop
+    async def handle(text):
+        return ml_model.predict_text(text)
+    return await asyncio.gather(*(handle(t) for t in texts))
+
+async def batched(texts, max_batch_size, max_wait_ms):
+    classifier = BatchClassifier(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    await classifier.start()
+    try:
+        return await asyncio.gather(*(classifier.classify(t) for t in texts))
+    finally:
+        await classifier.stop()
+
+def run(label, coro):
+    start = time.perf_counter()
+    result = asyncio.run(coro)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(result):>6} texts in {elapsed:7.3f}s  ->  {len(result) / elapsed:10.0f} texts/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call vs micro-batched tweet classification")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"Loading data from: {DATA_PATH}")
+    texts = pd.read_csv(DATA_PATH)["text"].astype(str).tolist()
+    texts = (texts * (args.requests // len(texts) + 1))[:args.requests]
+
+    ml_model.load_model()
+    baseline = run("per-call predict_text", per_call(texts))
+    result = run(f"batched (n={args.max_batch_size}, {args.max_wait_ms}ms)", batched(texts, args.max_batch_size, args.max_wait_ms))
+    print("✅ Labels match" if list(baseline) == list(result) else "❌ Labels differ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import re, sys, time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from utils import clean_text, clean_series
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
+DATA_PATH = BASE_DIR / "dependencies" / "raw-data" / "train.csv"
+
+EDGE_CASES = [
+    "", "   ", None, 3.5, "@abchttp://x.co", "http", "#Fire@ www.x.org", "ÇA BRÛLE!!",
+    "tab\there\nnewline nbsp sep", "KELVIN K", "İstanbul", "a\x1eb", "__@__ 123",
+]
+
+# Original five-pass implementation, kept as the parity reference
+def reference_clean_text(s: str) -> str:
+    if not isinstance(s, str):
+        return ""
+    s = s.lower()
+    s = re.sub(r"http\S+|www\.\S+", " ", s)
+    s = re.sub(r"@\w+", " ", s)
+    s = re.sub(r"#", " ", s)
+    s = re.sub(r"[^a-z\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+def reference_clean_series(texts):
+    return np.array([reference_clean_text(t) for t in texts])
+
+def timed(fn, texts, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"Loading data from: {DATA_PATH}")
+    texts = pd.read_csv(DATA_PATH)["text"].astype(str)
+
+    expected = reference_clean_series(texts)
+    ok = np.array_equal(expected, clean_series(texts)) and expected.dtype == clean_series(texts).dtype
+    ok &= all(reference_clean_text(t) == clean_text(t) for t in EDGE_CASES)
+    ok &= np.array_equal(reference_clean_series(EDGE_CASES), clean_series(EDGE_CASES))
+    if not ok:
+        print("❌ Output differs from reference")
+        sys.exit(1)
+    print("✅ Output identical to reference")
+
+    before = timed(reference_clean_series, texts)
+    after = timed(clean_series, texts)
+    print(f"reference clean_series: {before * 1000:8.1f} ms  ({len(texts) / before:10.0f} texts/s)")
+    print(f"batched clean_series:   {after * 1000:8.1f} ms  ({len(texts) / after:10.0f} texts/s)")
+    print(f"Speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import sys, time, joblib
+import pandas as pd
+from pathlib import Path
+from scorer import export_scorer, SparseScorer, MODEL_PATH, SCORER_PATH
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
+DATA_PATH = BASE_DIR / "dependencies" / "raw-data" / "train.csv"
+
+def mismatches(pipeline, scorer, texts) -> int:
+    expected = [int(label) for label in pipeline.predict(texts)]
+    return sum(a != b for a, b in zip(expected, scorer.predict(texts)))
+
+def main():
+    print(f"Loading model from: {MODEL_PATH}")
+    pipeline = joblib.load(MODEL_PATH)
+    print(f"Checking parity on: {DATA_PATH}")
+    texts = pd.read_csv(DATA_PATH)["text"].astype(str).tolist()
+
+    # Freshly exported (in memory, nothing is written) and the committed artifact
+    scorer = SparseScorer(export_scorer(pipeline))
+    failed = False
+    for name, candidate in (("exported scorer", scorer), (f"{SCORER_PATH.name}", SparseScorer(joblib.load(SCORER_PATH)))):
+        differ = mismatches(pipeline, candidate, texts)
+        print(f"✅ {name}: labels identical" if differ == 0 else f"❌ {name}: {differ} labels differ")
+        failed |= differ > 0
+
+    start = time.perf_counter()
+    pipeline.predict(texts)
+    pipeline_time = time.perf_counter() - start
+    start = time.perf_counter()
+    scorer.predict(texts)
+    scorer_time = time.perf_counter() - start
+    print(f"pipeline: {len(texts) / pipeline_time:10.0f} texts/s (batch)")
+    print(f"scorer:   {len(texts) / scorer_time:10.0f} texts/s (batch)")
+
+    sample = texts[:500]
+    start = time.perf_counter()
+    for t in sample:
+        pipeline.predict([t])
+    single_pipeline = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    for t in sample:
+        scorer.predict([t])
+    single_scorer = (time.perf_counter() - start) / len(sample)
+    print(f"single text: pipeline {single_pipeline * 1e6:.0f} us, scorer {single_scorer * 1e6:.0f} us")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,8 @@
-import re
 import joblib
 from pathlib import Path
-import numpy as np
 
 # Same cleaning functions used in training
-def clean_text(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    s = s.lower()
-    s = re.sub(r"http\S+|www\.\S+", " ", s)
-    s = re.sub(r"@\w+", " ", s)
-    s = re.sub(r"#", " ", s)
-    s = re.sub(r"[^a-z\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-def clean_series(texts):
-    return np.array([clean_text(t) for t in texts])
+from utils import clean_text, clean_series
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
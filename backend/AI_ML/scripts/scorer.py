@@ -0,0 +1,129 @@
+import re, math, joblib
+import numpy as np
+from pathlib import Path
+from collections import Counter
+from utils import clean_series
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
+MODEL_PATH = BASE_DIR / "backend" / "AI_ML" / "models" / "disaster_tweet_model.joblib"
+SCORER_PATH = BASE_DIR / "backend" / "AI_ML" / "models" / "disaster_tweet_scorer.joblib"
+
+ARTIFACT_FORMAT = "sparse_scorer"
+ARTIFACT_VERSION = 2
+
+def export_scorer(pipeline) -> dict:
+    """Compile a fitted clean -> TF-IDF -> LogisticRegression pipeline into
+    flat numpy arrays: the n-grams as sorted fixed-width bytes, and float32
+    coef * idf and idf in the same order, plus the intercept and the
+    tokenizer settings. Dumped uncompressed with joblib, the arrays load
+    with mmap_mode="r", so workers read them from the shared page cache."""
+    tfidf = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+    if len(clf.classes_) != 2 or tfidf.norm not in ("l2", None) or tfidf.sublinear_tf or tfidf.analyzer != "word":
+        raise ValueError("Only binary word n-gram TF-IDF + LogisticRegression pipelines can be exported")
+    encoded = [term.encode("utf-8") for term in tfidf.vocabulary_]
+    terms = np.array(encoded, dtype=f"S{max(map(len, encoded), default=1)}")
+    columns = np.fromiter(tfidf.vocabulary_.values(), dtype=np.intp, count=len(encoded))
+    order = np.argsort(terms, kind="stable")
+    idf = np.asarray(tfidf.idf_ if tfidf.use_idf else np.ones(len(encoded)), dtype=np.float64)[columns[order]]
+    coef = np.asarray(clf.coef_[0], dtype=np.float64)[columns[order]]
+    stop_words = tfidf.get_stop_words()
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "terms": terms[order],
+        "weight": (coef * idf).astype(np.float32),
+        "idf": idf.astype(np.float32),
+        "intercept": float(clf.intercept_[0]),
+        "classes": [int(c) for c in clf.classes_],
+        "token_pattern": tfidf.token_pattern,
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "ngram_range": list(tfidf.ngram_range),
+        "lowercase": bool(tfidf.lowercase),
+        "norm": tfidf.norm
+    }
+
+class SparseScorer:
+    """Standalone scorer built from an export_scorer artifact. Inference is
+    clean -> tokenize -> binary-search the n-grams in the sorted terms ->
+    sum weights, with the same labels as the pipeline. The arrays are used
+    as loaded, so a memory-mapped artifact is never copied."""
+
+    def __init__(self, artifact: dict):
+        if artifact.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Scorer artifact version {artifact.get('version')} is not supported, re-export it with scripts/scorer.py")
+        # Plain ndarray views: same (possibly memory-mapped) buffers, without np.memmap's per-index overhead
+        self.terms = np.asarray(artifact["terms"])
+        self.weight = np.asarray(artifact["weight"])
+        self.idf = np.asarray(artifact["idf"])
+        self.intercept = artifact["intercept"]
+        self.negative, self.positive = artifact["classes"]
+        self.token_pattern = re.compile(artifact["token_pattern"])
+        self.stop_words = frozenset(artifact["stop_words"])
+        self.min_n, self.max_n = artifact["ngram_range"]
+        self.lowercase = artifact["lowercase"]
+        self.normalize = artifact["norm"] == "l2"
+
+    @staticmethod
+    def is_artifact(obj) -> bool:
+        return isinstance(obj, dict) and obj.get("format") == ARTIFACT_FORMAT
+
+    def ngrams(self, text: str) -> list[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+        grams = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), self.max_n + 1):
+            grams += map(" ".join, zip(*(tokens[i:] for i in range(n))))
+        return grams
+
+    def lookup(self, grams: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """(weight, idf) for each gram, zero where it isn't in the vocabulary."""
+        width = self.terms.dtype.itemsize
+        # Casting a longer key to the terms' width would truncate it into a false match; b"" is never a term
+        keys = np.array([key if len(key) <= width else b"" for key in (gram.encode("utf-8") for gram in grams)], dtype=self.terms.dtype)
+        if not len(self.terms):
+            return np.zeros(len(keys)), np.zeros(len(keys))
+        positions = np.searchsorted(self.terms, keys)
+        np.minimum(positions, len(self.terms) - 1, out=positions)
+        missing = self.terms[positions] != keys
+        weight = self.weight[positions]
+        idf = self.idf[positions]
+        weight[missing] = 0
+        idf[missing] = 0
+        return weight, idf
+
+    def decisions(self, cleaned) -> list[float]:
+        """Decision function for already cleaned texts, with one vocabulary lookup for the batch."""
+        slot_of = {}
+        documents = []
+        for text in cleaned:
+            counts = Counter(self.ngrams(text))
+            documents.append(([slot_of.setdefault(gram, len(slot_of)) for gram in counts], counts.values()))
+        weight, idf = (values.tolist() for values in self.lookup(list(slot_of)))
+        scores = []
+        for slots, counts in documents:
+            dot = 0.0
+            norm = 0.0
+            for slot, count in zip(slots, counts):
+                dot += count * weight[slot]
+                norm += (count * idf[slot]) ** 2
+            if self.normalize and norm:
+                dot /= math.sqrt(norm)
+            scores.append(dot + self.intercept)
+        return scores
+
+    def predict(self, texts) -> list[int]:
+        return [self.positive if score > 0 else self.negative for score in self.decisions(clean_series(texts))]
+
+def main():
+    print(f"Loading model from: {MODEL_PATH}")
+    pipeline = joblib.load(MODEL_PATH)
+    artifact = export_scorer(pipeline)
+    joblib.dump(artifact, SCORER_PATH)
+    print(f"Scorer saved to: {SCORER_PATH} ({len(artifact['terms'])} n-grams)")
+    print("Run bench_scorer.py or pytest backend/AI_ML/tests to check it against the pipeline")
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer
 from sklearn.metrics import accuracy_score, classification_report
 from utils import clean_series
+from scorer import export_scorer, SCORER_PATH
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # disaster-management/
@@ -52,5 +53,9 @@ def main():
     joblib.dump(pipeline, MODEL_PATH)
     print(f"Model saved to: {MODEL_PATH}")
 
+    # Export the compiled scorer alongside the pipeline
+    joblib.dump(export_scorer(pipeline), SCORER_PATH)
+    print(f"Scorer saved to: {SCORER_PATH}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
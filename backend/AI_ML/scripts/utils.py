@@ -1,16 +1,27 @@
 import re
 import numpy as np
 
+URL_PATTERN = re.compile(r"http\S+|www\.\S+")
+# Mentions plus every non-letter in one pass; "#" is a non-letter so hashtags are covered too
+NOISE_PATTERN = re.compile(r"@\w+|[^a-z\s]")
+# Whitespace to all of the patterns above, so it never leaks between joined texts
+RECORD_SEPARATOR = "\x1e"
+
 def clean_text(s: str) -> str:
     if not isinstance(s, str):
         return ""
-    s = s.lower()
-    s = re.sub(r"http\S+|www\.\S+", " ", s)
-    s = re.sub(r"@\w+", " ", s)
-    s = re.sub(r"#", " ", s)
-    s = re.sub(r"[^a-z\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = URL_PATTERN.sub(" ", s.lower())
+    s = NOISE_PATTERN.sub(" ", s)
+    return " ".join(s.split())
 
 def clean_series(texts):
-    return np.array([clean_text(t) for t in texts])
\ No newline at end of file
+    texts = [t if isinstance(t, str) else "" for t in texts]
+    if not texts:
+        return np.array([])
+    joined = RECORD_SEPARATOR.join(texts)
+    if joined.count(RECORD_SEPARATOR) != len(texts) - 1:
+        # A text contains the separator itself, fall back to cleaning one by one
+        return np.array([clean_text(t) for t in texts])
+    # Run each regex once over the whole batch instead of once per text
+    joined = NOISE_PATTERN.sub(" ", URL_PATTERN.sub(" ", joined.lower()))
+    return np.array([" ".join(part.split()) for part in joined.split(RECORD_SEPARATOR)])
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from utils import clean_text, clean_series
+from bench_clean import DATA_PATH, EDGE_CASES, reference_clean_text, reference_clean_series
+
+def test_clean_series_matches_reference_on_train_csv():
+    texts = pd.read_csv(DATA_PATH)["text"].astype(str)
+    expected = reference_clean_series(texts)
+    cleaned = clean_series(texts)
+    assert cleaned.dtype == expected.dtype
+    assert np.array_equal(cleaned, expected)
+
+def test_edge_cases_match_reference():
+    assert [clean_text(t) for t in EDGE_CASES] == [reference_clean_text(t) for t in EDGE_CASES]
+    assert np.array_equal(clean_series(EDGE_CASES), reference_clean_series(EDGE_CASES))
+
+def test_separator_in_text_falls_back_to_per_text_cleaning():
+    texts = ["a\x1eb", "Flood @ward http://x.co NOW"]
+    assert clean_series(texts).tolist() == [reference_clean_text(t) for t in texts]
@@ -0,0 +1,39 @@
+import joblib
+import pytest
+import numpy as np
+import pandas as pd
+from scorer import export_scorer, SparseScorer, MODEL_PATH, SCORER_PATH
+from bench_scorer import DATA_PATH
+
+pytest.importorskip("sklearn")
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return joblib.load(MODEL_PATH)
+
+@pytest.fixture(scope="module")
+def texts():
+    return pd.read_csv(DATA_PATH)["text"].astype(str).tolist()
+
+@pytest.fixture(scope="module")
+def expected(pipeline, texts):
+    return [int(label) for label in pipeline.predict(texts)]
+
+def test_exported_scorer_matches_pipeline(pipeline, texts, expected, tmp_path):
+    # Round-trips through a file like the served artifact, without touching the committed one
+    path = tmp_path / "scorer.joblib"
+    joblib.dump(export_scorer(pipeline), path)
+    assert SparseScorer(joblib.load(path, mmap_mode="r")).predict(texts) == expected
+
+def test_committed_scorer_is_current(texts, expected):
+    assert SparseScorer(joblib.load(SCORER_PATH, mmap_mode="r")).predict(texts) == expected
+
+def test_committed_scorer_is_memory_mapped():
+    artifact = joblib.load(SCORER_PATH, mmap_mode="r")
+    for key in ("terms", "weight", "idf"):
+        assert isinstance(artifact[key], np.memmap)
+
+def test_empty_and_unknown_texts_score_the_intercept(pipeline):
+    scorer = SparseScorer(export_scorer(pipeline))
+    texts = ["", "zzqx qqzz", None]
+    assert scorer.predict(texts) == [int(label) for label in pipeline.predict(texts)]
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+from pymongo import ReturnDocument
+from backend.config import AGENCY_DIRECTORY_CHECK_SECONDS
+from backend.json_stream import dumps
+
+# Fields the agency list needs for the map, tables and filters, which keeps the polled
+# response small. This is not access control: the API has no authentication, and contact
+# details, email and licence number are served by GET /rescue-agencies/{agency_id} and
+# by the list with details=true
+PUBLIC_FIELDS = (
+    "name", "type", "location", "contactPerson", "city", "district", "state", "specialization",
+    "latitude", "longitude", "resources", "status", "last_updated", "response_time",
+    "location_timestamp", "location_accuracy", "location_speed", "location_heading"
+)
+PUBLIC_PROJECTION = {field: 1 for field in PUBLIC_FIELDS}
+
+class AgencyDirectory:
+    """In-memory copy of the agency list for GET /rescue-agencies/.
+
+    Loaded from MongoDB on first use and again after the agencies change.
+    Every write bumps a version counter in MongoDB; each worker reads it at
+    most every check_seconds while serving and reloads when another worker
+    moved it. The encoded response and its ETag are cached until the next
+    change, so repeat polls cost no query and no encoding."""
+
+    def __init__(self, check_seconds: float = AGENCY_DIRECTORY_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self.collection = None
+        self.agencies: dict[str, dict] | None = None
+        self.generation = 0
+        # Shared version the cached copy reflects
+        self.version = None
+        self.stats = {"loads": 0, "hits": 0, "version_errors": 0}
+        self._checked_at = 0.0
+        self._body = None
+        self._etag = None
+        self._lock = asyncio.Lock()
+
+    def start(self, collection):
+        self.collection = collection
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop this worker's copy only."""
+        self.generation += 1
+        self.agencies = None
+        self.version = None
+        self._body = None
+
+    async def changed(self):
+        """After a committed write to the agencies: drop this worker's copy and
+        tell the others. Never raises, the write has already happened."""
+        self.invalidate()
+        await self._bump()
+
+    async def apply_locations(self, fields_by_agency: dict[str, dict]):
+        """Patch live-location writes into the cached copy instead of reloading,
+        and tell the other workers."""
+        seen = self.version
+        if self.agencies is not None:
+            for agency_id, fields in fields_by_agency.items():
+                if agency_id in self.agencies:
+                    self.agencies[agency_id].update(fields)
+                    self._body = None
+        version = await self._bump()
+        # Nobody else wrote in between, so the patched copy is current at the new version
+        if version is not None and seen is not None and version == seen + 1 and self.version == seen:
+            self.version = version
+
+    @property
+    def _versions(self):
+        return self.collection.database["counters"]
+
+    @property
+    def _version_id(self) -> str:
+        return f"{self.collection.name}:directory"
+
+    async def _bump(self) -> int | None:
+        if self.collection is None:
+            return None
+        try:
+            counter = await self._versions.find_one_and_update(
+                {"_id": self._version_id}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return counter["version"]
+        except Exception as e:
+            self.stats["version_errors"] += 1
+            print(f"⚠️ Could not publish agency change to other workers: {e}")
+            return None
+
+    async def _read_version(self) -> int:
+        counter = await self._versions.find_one({"_id": self._version_id})
+        return counter["version"] if counter else 0
+
+    async def _check(self):
+        """Reload if another worker wrote since the copy was loaded."""
+        now = asyncio.get_running_loop().time()
+        if now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            version = await self._read_version()
+        except Exception as e:
+            # Keep serving the copy we have
+            self.stats["version_errors"] += 1
+            print(f"⚠️ Could not check agency list version: {e}")
+            return
+        if version != self.version:
+            self.invalidate()
+
+    async def _load(self):
+        async with self._lock:
+            # A write during the query makes the result stale; load again
+            while self.agencies is None:
+                generation = self.generation
+                # Read before the list: a write in between only causes one extra reload
+                version = await self._read_version()
+                agencies = {}
+                async for agency in self.collection.find({}, PUBLIC_PROJECTION):
+                    agency_id = str(agency.pop("_id"))
+                    agencies[agency_id] = {"id": agency_id, **agency}
+                if generation == self.generation:
+                    self.agencies = agencies
+                    self.version = version
+                    self._checked_at = asyncio.get_running_loop().time()
+                    self.stats["loads"] += 1
+
+    async def snapshot(self) -> tuple[bytes, str]:
+        """Encoded {"success", "agencies"} response and its ETag."""
+        if self.agencies is not None:
+            await self._check()
+        if self.agencies is None:
+            await self._load()
+        else:
+            self.stats["hits"] += 1
+        if self._body is None:
+            self._body = dumps({"success": True, "agencies": list(self.agencies.values())})
+            self._etag = f'"agencies-{hashlib.blake2b(self._body, digest_size=12).hexdigest()}"'
+        return self._body, self._etag
+
+agency_directory = AgencyDirectory()
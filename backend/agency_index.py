@@ -0,0 +1,187 @@
+import math
+import heapq
+from bson import ObjectId
+from backend.config import AGENCY_INDEX_CELL_DEG, AGENCY_TRAVEL_SPEED_KMH, AGENCY_ROAD_FACTOR
+from backend.geo import is_valid_coordinate, haversine_m
+
+KM_PER_DEGREE = 111.32
+INDEX_PROJECTION = {"name": 1, "type": 1, "status": 1, "latitude": 1, "longitude": 1, "response_time": 1, "resources.availability": 1, "resources.estimated_response_time": 1}
+
+def is_dispatchable(agency: dict) -> bool:
+    return agency.get("status") == "Approved" and (agency.get("resources") or {}).get("availability") == "Available"
+
+class AgencyIndex:
+    """Grid index over approved, available rescue agencies for k-nearest
+    lookups. Cells are cell_deg wide; a query scans rings of cells outward
+    and stops once no unvisited cell can beat the k-th best distance.
+    Dispatchable agencies with no position yet are held outside the grid
+    until their first live location."""
+
+    def __init__(self, cell_deg: float = AGENCY_INDEX_CELL_DEG, speed_kmh: float = AGENCY_TRAVEL_SPEED_KMH, road_factor: float = AGENCY_ROAD_FACTOR):
+        self.cell_deg = cell_deg
+        self.speed_kmh = speed_kmh
+        self.road_factor = road_factor
+        self.agencies: dict[str, dict] = {}
+        self.unplaced: dict[str, dict] = {}
+        self.cells: dict[tuple, set] = {}
+        self._extent = None  # (min_x, min_y, max_x, max_y) of occupied cells, rebuilt lazily
+        self.collection = None
+
+    def _cell(self, latitude: float, longitude: float) -> tuple:
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    def upsert(self, agency: dict):
+        agency_id = str(agency.get("_id") or agency.get("id"))
+        if not is_dispatchable(agency):
+            self.remove(agency_id)
+            return
+        resources = agency.get("resources") or {}
+        entry = {
+            "id": agency_id,
+            "name": agency.get("name"),
+            "type": agency.get("type"),
+            "response_time": resources.get("estimated_response_time") or agency.get("response_time") or 30
+        }
+        self.remove(agency_id)
+        if is_valid_coordinate(agency.get("latitude"), agency.get("longitude")):
+            self._place(entry, agency["latitude"], agency["longitude"])
+        else:
+            self.unplaced[agency_id] = entry
+
+    def _place(self, entry: dict, latitude: float, longitude: float):
+        entry["latitude"], entry["longitude"] = latitude, longitude
+        entry["cell"] = self._cell(latitude, longitude)
+        self.agencies[entry["id"]] = entry
+        self._occupy(entry["cell"], entry["id"])
+
+    def move(self, agency_id: str, latitude: float, longitude: float):
+        """Live-location update; agencies that aren't dispatchable stay out of the index."""
+        if not is_valid_coordinate(latitude, longitude):
+            return
+        entry = self.agencies.get(agency_id)
+        if entry is None:
+            entry = self.unplaced.pop(agency_id, None)
+            if entry is not None:
+                self._place(entry, latitude, longitude)
+            return
+        cell = self._cell(latitude, longitude)
+        if cell != entry["cell"]:
+            self._discard(entry)
+            entry["cell"] = cell
+            self._occupy(cell, agency_id)
+        entry["latitude"], entry["longitude"] = latitude, longitude
+
+    def remove(self, agency_id: str):
+        self.unplaced.pop(agency_id, None)
+        entry = self.agencies.pop(agency_id, None)
+        if entry is not None:
+            self._discard(entry)
+
+    def _occupy(self, cell: tuple, agency_id: str):
+        if cell not in self.cells:
+            self.cells[cell] = set()
+            self._extent = None
+        self.cells[cell].add(agency_id)
+
+    def _discard(self, entry: dict):
+        cell = self.cells.get(entry["cell"])
+        if cell is not None:
+            cell.discard(entry["id"])
+            if not cell:
+                del self.cells[entry["cell"]]
+                self._extent = None
+
+    def _max_ring(self, cx: int, cy: int) -> int:
+        if self._extent is None:
+            xs = [x for x, _ in self.cells]
+            ys = [y for _, y in self.cells]
+            self._extent = (min(xs), min(ys), max(xs), max(ys))
+        min_x, min_y, max_x, max_y = self._extent
+        return max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+
+    def _ring(self, cx: int, cy: int, ring: int):
+        if ring == 0:
+            return [(cx, cy)]
+        if 8 * ring > len(self.cells):
+            # Sparse index: cheaper to pick occupied cells than to walk the ring
+            return [c for c in self.cells if max(abs(c[0] - cx), abs(c[1] - cy)) == ring]
+        top, bottom = cy + ring, cy - ring
+        cells = [(x, y) for x in range(cx - ring, cx + ring + 1) for y in (bottom, top)]
+        cells += [(x, y) for x in (cx - ring, cx + ring) for y in range(bottom + 1, top)]
+        return cells
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5, max_km: float | None = None) -> list[dict]:
+        if not self.agencies or k <= 0:
+            return []
+        cx, cy = self._cell(latitude, longitude)
+        max_ring = self._max_ring(cx, cy)
+        best = []  # max-heap of (-distance_km, id)
+        for ring in range(max_ring + 1):
+            if ring > 0:
+                # Anything in this ring is at least ring - 1 cells away; longitude cells shrink towards the poles
+                cos_lat = max(math.cos(math.radians(min(abs(latitude) + ring * self.cell_deg, 90))), 0.0)
+                bound = (ring - 1) * self.cell_deg * KM_PER_DEGREE * cos_lat
+                if (len(best) == k and bound > -best[0][0]) or (max_km is not None and bound > max_km):
+                    break
+            for cell in self._ring(cx, cy, ring):
+                for agency_id in self.cells.get(cell, ()):
+                    entry = self.agencies[agency_id]
+                    distance_km = haversine_m(latitude, longitude, entry["latitude"], entry["longitude"]) / 1000
+                    if max_km is not None and distance_km > max_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance_km, agency_id))
+                    elif distance_km < -best[0][0]:
+                        heapq.heapreplace(best, (-distance_km, agency_id))
+        return [self._result(agency_id, -negative) for negative, agency_id in sorted(best, reverse=True)]
+
+    def _result(self, agency_id: str, distance_km: float) -> dict:
+        entry = self.agencies[agency_id]
+        travel_minutes = distance_km * self.road_factor / self.speed_kmh * 60
+        return {
+            "id": agency_id,
+            "name": entry["name"],
+            "type": entry["type"],
+            "latitude": entry["latitude"],
+            "longitude": entry["longitude"],
+            "distance_km": round(distance_km, 2),
+            # Time to mobilise plus road travel at an average speed
+            "eta_minutes": round(entry["response_time"] + travel_minutes)
+        }
+
+    async def load(self, collection):
+        self.collection = collection
+        try:
+            agencies = await collection.find({"status": "Approved", "resources.availability": "Available"}, INDEX_PROJECTION).to_list(None)
+        except Exception as e:
+            print(f"⚠️ MongoDB unavailable, agency index starting empty: {e}")
+            return
+        self.agencies.clear()
+        self.unplaced.clear()
+        self.cells.clear()
+        self._extent = None
+        for agency in agencies:
+            self.upsert(agency)
+        print(f"✅ Agency index loaded with {len(self.agencies)} available agencies ({len(self.unplaced)} awaiting a location)")
+
+    async def refresh(self, agency_id: str):
+        """Re-read one agency after a write and update or drop its entry."""
+        if self.collection is None:
+            return
+        agency = await self.collection.find_one({"_id": ObjectId(agency_id)}, INDEX_PROJECTION)
+        if agency is None:
+            self.remove(agency_id)
+        else:
+            self.upsert(agency)
+
+    async def refresh_many(self, agency_ids):
+        """refresh() for a batch of agencies in one query."""
+        if self.collection is None or not agency_ids:
+            return
+        found = await self.collection.find({"_id": {"$in": [ObjectId(agency_id) for agency_id in agency_ids]}}, INDEX_PROJECTION).to_list(None)
+        for agency in found:
+            self.upsert(agency)
+        for agency_id in set(agency_ids) - {str(agency["_id"]) for agency in found}:
+            self.remove(agency_id)
+
+agency_index = AgencyIndex()
@@ -0,0 +1,84 @@
+import asyncio
+from backend import ml_model
+from backend.config import CLASSIFIER_MAX_BATCH_SIZE, CLASSIFIER_MAX_WAIT_MS
+
+class BatchClassifier:
+    """Collects concurrent texts into micro-batches and classifies each batch
+    with a single model.predict call in a worker thread."""
+
+    def __init__(self, max_batch_size: int = CLASSIFIER_MAX_BATCH_SIZE, max_wait_ms: float = CLASSIFIER_MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._inflight: list = []
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        # Fail anything still waiting so callers don't hang on shutdown
+        pending = self._inflight
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Classifier stopped"))
+        self._inflight = []
+
+    async def classify(self, text: str) -> int:
+        if not self.running:
+            # Not started (scripts, tests) - classify off the event loop directly
+            return (await asyncio.to_thread(ml_model.predict_batch, [text]))[0]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _collect(self, batch: list):
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        while True:
+            batch = self._inflight = []
+            await self._collect(batch)
+            texts = [text for text, _ in batch]
+            try:
+                labels = await asyncio.to_thread(ml_model.predict_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), label in zip(batch, labels):
+                if not future.done():
+                    future.set_result(label)
+
+classifier = BatchClassifier()
@@ -52,4 +52,68 @@ ALLOWED_ORIGINS = [
 # -------------------------
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/gif"]
-ALLOWED_AUDIO_TYPES = ["audio/webm", "audio/mp3", "audio/wav"]
\ No newline at end of file
+ALLOWED_AUDIO_TYPES = ["audio/webm", "audio/mp3", "audio/wav"]
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "uploads/media")
+# Photo + voice note + form fields
+MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", str(2 * MAX_FILE_SIZE + 1024 * 1024)))
+
+# -------------------------
+# Classifier Configuration
+# -------------------------
+CLASSIFIER_MAX_BATCH_SIZE = int(os.getenv("CLASSIFIER_MAX_BATCH_SIZE", "64"))
+CLASSIFIER_MAX_WAIT_MS = float(os.getenv("CLASSIFIER_MAX_WAIT_MS", "5"))
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "0"))  # seconds, 0 = no expiry
+CLASSIFY_STREAM_BATCH_SIZE = int(os.getenv("CLASSIFY_STREAM_BATCH_SIZE", "2048"))
+JSON_STREAM_BATCH_SIZE = int(os.getenv("JSON_STREAM_BATCH_SIZE", "500"))  # documents encoded per chunk of streamed list responses
+
+# -------------------------
+# SOS Dashboard Configuration
+# -------------------------
+SOS_STATS_RECENT_SIZE = int(os.getenv("SOS_STATS_RECENT_SIZE", "100"))
+SOS_STATS_RESYNC_SECONDS = float(os.getenv("SOS_STATS_RESYNC_SECONDS", "60"))
+SOS_STREAM_QUEUE_SIZE = int(os.getenv("SOS_STREAM_QUEUE_SIZE", "256"))  # events buffered per client before it is dropped
+SOS_STREAM_HEARTBEAT_SECONDS = float(os.getenv("SOS_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# -------------------------
+# SOS Ingestion Configuration
+# -------------------------
+SOS_JOURNAL_PATH = os.getenv("SOS_JOURNAL_PATH", "data/sos_journal.jsonl")  # each worker writes sos_journal.<pid>.jsonl
+SOS_JOURNAL_COMMIT_MS = float(os.getenv("SOS_JOURNAL_COMMIT_MS", "2"))  # wait for more appends to share one fsync
+SOS_FLUSH_INTERVAL_MS = float(os.getenv("SOS_FLUSH_INTERVAL_MS", "50"))
+SOS_FLUSH_BATCH_SIZE = int(os.getenv("SOS_FLUSH_BATCH_SIZE", "1000"))
+SOS_FLUSH_RETRY_SECONDS = float(os.getenv("SOS_FLUSH_RETRY_SECONDS", "5"))
+# Reserved change_seq values not released after this long are treated as abandoned by /sos/sync
+CHANGE_SEQ_LEASE_SECONDS = float(os.getenv("CHANGE_SEQ_LEASE_SECONDS", "60"))
+# Repeat alerts within this window collapse into one incident
+SOS_DEDUP_WINDOW_SECONDS = float(os.getenv("SOS_DEDUP_WINDOW_SECONDS", "300"))
+SOS_DEDUP_RADIUS_M = float(os.getenv("SOS_DEDUP_RADIUS_M", "100"))  # any reporter
+SOS_DEDUP_REPORTER_RADIUS_M = float(os.getenv("SOS_DEDUP_REPORTER_RADIUS_M", "1000"))  # same reporter
+# -------------------------
+# Rescue Agency Dispatch Configuration
+# -------------------------
+AGENCY_INDEX_CELL_DEG = float(os.getenv("AGENCY_INDEX_CELL_DEG", "0.1"))  # ~11km grid cells
+AGENCY_TRAVEL_SPEED_KMH = float(os.getenv("AGENCY_TRAVEL_SPEED_KMH", "30"))  # average on hill roads
+AGENCY_ROAD_FACTOR = float(os.getenv("AGENCY_ROAD_FACTOR", "1.4"))  # road distance / straight-line distance
+SOS_NEAREST_AGENCIES = int(os.getenv("SOS_NEAREST_AGENCIES", "3"))
+AGENCY_BULK_MAX_ITEMS = int(os.getenv("AGENCY_BULK_MAX_ITEMS", "500"))  # updates per PUT /rescue-agencies/bulk
+AGENCY_DIRECTORY_CHECK_SECONDS = float(os.getenv("AGENCY_DIRECTORY_CHECK_SECONDS", "2"))  # how long another worker's agency write can go unseen
+LOCATION_FLUSH_INTERVAL_MS = float(os.getenv("LOCATION_FLUSH_INTERVAL_MS", "1000"))  # live-location pings are written to MongoDB this often
+LOCATION_MAX_CLOCK_SKEW_SECONDS = float(os.getenv("LOCATION_MAX_CLOCK_SKEW_SECONDS", "30"))  # fixes timestamped further ahead get the server time
+# Location history is stored in one document per agency per hour
+LOCATION_HISTORY_SEAL_MINUTES = float(os.getenv("LOCATION_HISTORY_SEAL_MINUTES", "10"))  # pack an hour this long after it ends
+LOCATION_HISTORY_MAX_POINTS = int(os.getenv("LOCATION_HISTORY_MAX_POINTS", "500"))  # default trajectory point budget
+
+
+# -------------------------
+# Heatmap Configuration
+# -------------------------
+HEATMAP_MIN_ZOOM = int(os.getenv("HEATMAP_MIN_ZOOM", "6"))
+HEATMAP_MAX_ZOOM = int(os.getenv("HEATMAP_MAX_ZOOM", "14"))
+HEATMAP_MAX_CELLS = int(os.getenv("HEATMAP_MAX_CELLS", "65536"))  # per response; larger viewports drop to a coarser zoom
+HEATMAP_SNAPSHOT_PATH = os.getenv("HEATMAP_SNAPSHOT_PATH", "data/heatmap.npz")
+HEATMAP_SNAPSHOT_SECONDS = float(os.getenv("HEATMAP_SNAPSHOT_SECONDS", "300"))
+# Writes from other workers and scripts are counted by a catch-up replay from MongoDB
+HEATMAP_RECONCILE_SECONDS = float(os.getenv("HEATMAP_RECONCILE_SECONDS", "30"))
+HEATMAP_RECONCILE_LAG_SECONDS = float(os.getenv("HEATMAP_RECONCILE_LAG_SECONDS", "60"))  # replay stops this far behind now, past in-flight writes
\ No newline at end of file
@@ -1,14 +1,162 @@
-from backend.config import db
-from datetime import datetime
+from backend.config import db, CHANGE_SEQ_LEASE_SECONDS
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 # Collections
 reports_collection = db["reports"]
 sos_alerts_collection = db["sos_alerts"]
 users_collection = db["users"]
+media_blobs_collection = db["media_blobs"]
 
-# In-memory fallback
+# Change sequences
+async def reserve_change_seq(collection, count: int = 1) -> tuple[int, ObjectId]:
+    """Reserve count consecutive change_seq values for collection and record
+    them as in flight on the counter. Returns the first value and the lease
+    token to pass to release_change_seq once the write has landed."""
+    counters = collection.database["counters"]
+    token = ObjectId()
+    while True:
+        counter = await counters.find_one({"_id": collection.name}, {"seq": 1})
+        if counter is None:
+            try:
+                await counters.insert_one({"_id": collection.name, "seq": 0, "pending": []})
+            except DuplicateKeyError:
+                pass
+            continue
+        seq = counter["seq"]
+        # Compare-and-set, so the range and its lease appear in one write
+        result = await counters.update_one(
+            {"_id": collection.name, "seq": seq},
+            {"$set": {"seq": seq + count}, "$push": {"pending": {"token": token, "first": seq + 1, "at": datetime.utcnow()}}}
+        )
+        if result.modified_count:
+            return seq + 1, token
+
+async def release_change_seq(collection, token: ObjectId):
+    await collection.database["counters"].update_one({"_id": collection.name}, {"$pull": {"pending": {"token": token}}})
+
+@asynccontextmanager
+async def change_seq_lease(collection, count: int = 1):
+    """Reserve count change_seq values for the writes inside the block.
+
+    Readers stop below the lowest reservation still in flight, so a write
+    that commits after a higher sequence has landed is never skipped."""
+    first, token = await reserve_change_seq(collection, count)
+    try:
+        yield first
+    finally:
+        try:
+            await release_change_seq(collection, token)
+        except Exception as e:
+            print(f"⚠️ Could not release change_seq lease, it expires in {CHANGE_SEQ_LEASE_SECONDS:g}s: {e}")
+
+async def committed_change_seq(collection) -> int:
+    """Highest change_seq below every live reservation; everything up to it has landed."""
+    counter = await collection.database["counters"].find_one({"_id": collection.name})
+    if counter is None:
+        return 0
+    # A lease past its expiry belongs to a writer that died; its values are a gap
+    cutoff = datetime.utcnow() - timedelta(seconds=CHANGE_SEQ_LEASE_SECONDS)
+    live = [lease["first"] for lease in counter.get("pending", []) if lease["at"] >= cutoff]
+    expired = len(counter.get("pending", [])) - len(live)
+    if expired:
+        await collection.database["counters"].update_one({"_id": collection.name}, {"$pull": {"pending": {"at": {"$lt": cutoff}}}})
+    return min(live) - 1 if live else counter["seq"]
+
+async def backfill_change_seq(collection, chunk_size: int = 1000):
+    """Give documents written before change_seq existed a sequence, oldest first."""
+    while True:
+        docs = await collection.find({"change_seq": {"$exists": False}}, {"_id": 1}).sort("_id", 1).limit(chunk_size).to_list(chunk_size)
+        if not docs:
+            return
+        async with change_seq_lease(collection, len(docs)) as first:
+            await collection.bulk_write([
+                UpdateOne({"_id": doc["_id"], "change_seq": {"$exists": False}}, {"$set": {"change_seq": first + i}})
+                for i, doc in enumerate(docs)
+            ], ordered=False)
+
+# Indexes
+async def ensure_import_index(collection=reports_collection):
+    """Unique import_id, which lets bulk imports replay a batch without duplicating rows. Raises on failure."""
+    await collection.create_index("import_id", unique=True, sparse=True)
+
+async def ensure_indexes():
+    try:
+        # Each filter pairs with _id so filtered pages are still keyset scans
+        for field in ("label", "severity", "disaster_type"):
+            await reports_collection.create_index([(field, ASCENDING), ("_id", DESCENDING)])
+        await ensure_import_index(reports_collection)
+        # Dashboard: severity counts and newest-first recent alerts
+        await sos_alerts_collection.create_index([("timestamp", DESCENDING)])
+        await sos_alerts_collection.create_index([("severity", ASCENDING), ("timestamp", DESCENDING)])
+        # Alerts stored before the GeoJSON field existed
+        await sos_alerts_collection.update_many(
+            {
+                "location": {"$exists": False},
+                "latitude": {"$type": "number", "$gte": -90, "$lte": 90},
+                "longitude": {"$type": "number", "$gte": -180, "$lte": 180}
+            },
+            [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+        )
+        await sos_alerts_collection.create_index([("location", GEOSPHERE)])
+        # Delta sync walks alerts in change order
+        await backfill_change_seq(sos_alerts_collection)
+        await sos_alerts_collection.create_index([("change_seq", ASCENDING)])
+        print("✅ MongoDB indexes ready")
+    except Exception as e:
+        print(f"⚠️ MongoDB unavailable, skipping index creation: {e}")
+
+# Agency listing filters: query parameter -> document field
+AGENCY_FILTER_FIELDS = {
+    "status": "status",
+    "type": "type",
+    "district": "district",
+    "city": "city",
+    "specialization": "specialization",
+    "availability": "resources.availability"
+}
+# Every filter field leads at least one index, so no combination of filters
+# is a collection scan. None of them are touched by live-location writes.
+AGENCY_INDEXES = [
+    [("status", ASCENDING), ("resources.availability", ASCENDING), ("type", ASCENDING), ("district", ASCENDING), ("_id", ASCENDING)],
+    [("type", ASCENDING), ("district", ASCENDING), ("_id", ASCENDING)],
+    [("district", ASCENDING), ("type", ASCENDING), ("_id", ASCENDING)],
+    [("resources.availability", ASCENDING), ("type", ASCENDING), ("_id", ASCENDING)],
+    [("city", ASCENDING), ("_id", ASCENDING)],
+    [("specialization", ASCENDING), ("_id", ASCENDING)]
+]
+
+async def ensure_agency_indexes(collection):
+    # Agencies live in their own database, see backend/routes/rescue_agencies.py
+    try:
+        for keys in AGENCY_INDEXES:
+            await collection.create_index(keys)
+        print("✅ Rescue agency indexes ready")
+    except Exception as e:
+        print(f"⚠️ MongoDB unavailable, skipping rescue agency indexes: {e}")
+
+def agency_query(filters: dict, after=None) -> dict:
+    query = {AGENCY_FILTER_FIELDS[name]: value for name, value in filters.items() if value is not None}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    return query
+
+async def get_agencies(collection, limit=100, after=None, filters=None, projection=None):
+    """One page of agencies in registration order as a cursor, plus the next page cursor."""
+    query = agency_query(filters or {}, after)
+    # Same boundary peek as get_reports, ascending
+    boundary = await collection.find(query, {"_id": 1}).sort("_id", 1).skip(limit - 1).limit(2).to_list(2)
+    if not boundary:
+        return collection.find(query, projection).sort("_id", 1).limit(limit), None
+    next_cursor = str(boundary[0]["_id"]) if len(boundary) > 1 else None
+    query["_id"] = {**query.get("_id", {}), "$lte": boundary[0]["_id"]}
+    return collection.find(query, projection).sort("_id", 1), next_cursor
+
+# In-memory fallback (SOS alerts go through the durable journal in backend/sos_journal.py)
 in_memory_reports = []
-in_memory_sos_alerts = []
 in_memory_users = []
 
 # Insert Report
@@ -18,30 +166,35 @@ async def insert_report(report_data):
         return str(result.inserted_id)
     except Exception as e:
         print(f"⚠️ MongoDB unavailable, storing report in-memory: {e}")
-        report_id = f"mem_{len(in_memory_reports) + 1}_{datetime.now().timestamp()}"
-        report_data["_id"] = report_id
+        # ObjectIds keep in-memory reports in the same keyset order as stored ones
+        report_data["_id"] = ObjectId()
         in_memory_reports.append(report_data)
-        return report_id
+        return str(report_data["_id"])
 
-# Get Reports
-async def get_reports(limit=100):
+# Get Reports (newest first, keyset-paginated on _id)
+async def get_reports(limit=100, after=None, filters=None, fields=None):
+    """One page of reports as a cursor to stream from, plus the next page cursor."""
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
     try:
-        reports = await reports_collection.find().to_list(limit)
-        for r in reports:
-            r["_id"] = str(r["_id"])
-        return reports
+        query = dict(filters)
+        if after:
+            query["_id"] = {"$lt": ObjectId(after)}
+        projection = {field: 1 for field in fields} if fields else None
+        # Index-only peek at the page's last _id and whether anything follows it
+        boundary = await reports_collection.find(query, {"_id": 1}).sort("_id", -1).skip(limit - 1).limit(2).to_list(2)
+        if not boundary:
+            return reports_collection.find(query, projection).sort("_id", -1).limit(limit), None
+        next_cursor = str(boundary[0]["_id"]) if len(boundary) > 1 else None
+        # Pinned to the boundary so reports inserted meanwhile can't push the page past the cursor
+        query["_id"] = {**query.get("_id", {}), "$gte": boundary[0]["_id"]}
+        return reports_collection.find(query, projection).sort("_id", -1), next_cursor
     except Exception as e:
         print(f"⚠️ MongoDB unavailable, using in-memory reports: {e}")
-        return in_memory_reports.copy()
-
-# Insert SOS Alert
-async def insert_sos_alert(alert_data):
-    try:
-        result = await sos_alerts_collection.insert_one(alert_data)
-        return str(result.inserted_id)
-    except Exception as e:
-        print(f"⚠️ MongoDB unavailable, storing SOS alert in-memory: {e}")
-        alert_id = f"sos_{len(in_memory_sos_alerts) + 1}_{datetime.now().timestamp()}"
-        alert_data["_id"] = alert_id
-        in_memory_sos_alerts.append(alert_data)
-        return alert_id
\ No newline at end of file
+        reports = [
+            r for r in reversed(in_memory_reports)
+            if all(r.get(k) == v for k, v in filters.items()) and (not after or r["_id"] < ObjectId(after))
+        ]
+        page = reports[:limit]
+        if fields:
+            page = [{k: v for k, v in r.items() if k == "_id" or k in fields} for r in page]
+        return page, str(page[-1]["_id"]) if len(reports) > limit else None
@@ -0,0 +1,88 @@
+import math
+
+# Rough bounding box of Uttarakhand: (min_lat, min_lng, max_lat, max_lng)
+UTTARAKHAND_BOUNDS = (28.7, 77.5, 31.5, 81.1)
+UTTARAKHAND_CENTER = {"lat": 30.0668, "lng": 79.0193}
+
+def is_valid_coordinate(latitude, longitude) -> bool:
+    return (
+        isinstance(latitude, (int, float)) and isinstance(longitude, (int, float))
+        and -90 <= latitude <= 90 and -180 <= longitude <= 180
+    )
+
+def geojson_point(latitude: float, longitude: float) -> dict:
+    # GeoJSON is [longitude, latitude]
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+# Web-mercator maps stop here; a viewport is clamped to it
+MAP_MAX_LAT = 85.0511
+# GeoJSON polygon edges are geodesics, not parallels. Edge vertices every BBOX_EDGE_STEP_DEG keep
+# an edge within ~0.001° of its parallel, and BBOX_PAD_DEG covers that
+BBOX_EDGE_STEP_DEG = 1.0
+BBOX_PAD_DEG = 0.01
+
+def bbox_polygon(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> dict:
+    steps = max(1, math.ceil((max_lng - min_lng) / BBOX_EDGE_STEP_DEG))
+    lngs = [min_lng + (max_lng - min_lng) * i / steps for i in range(steps + 1)]
+    ring = [[lng, min_lat] for lng in lngs] + [[lng, max_lat] for lng in reversed(lngs)] + [[min_lng, min_lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+def bbox_match(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> dict:
+    """Query for GeoJSON `location` points inside an axis-aligned lat/lng box.
+
+    A slightly padded polygon lets the 2dsphere index find candidates, and
+    plain coordinate ranges keep exactly the box. Boxes a polygon can't
+    express (half the globe or more) use the ranges alone."""
+    exact = {
+        "location.coordinates.0": {"$gte": min_lng, "$lte": max_lng},
+        "location.coordinates.1": {"$gte": min_lat, "$lte": max_lat}
+    }
+    if max_lng - min_lng >= 180 - 2 * BBOX_PAD_DEG or max_lat - min_lat >= 90:
+        return exact
+    polygon = bbox_polygon(
+        max(min_lat - BBOX_PAD_DEG, -90), max(min_lng - BBOX_PAD_DEG, -180),
+        min(max_lat + BBOX_PAD_DEG, 90), min(max_lng + BBOX_PAD_DEG, 180)
+    )
+    return {"location": {"$geoWithin": {"$geometry": polygon}}, **exact}
+
+def cluster_cell_size(zoom: int, cell_pixels: int = 64) -> float:
+    """Width in degrees of a cluster cell that covers cell_pixels on a 256px web-mercator tile at this zoom."""
+    return cell_pixels * 360 / (256 * 2 ** zoom)
+
+# District headquarters, used to attribute alerts to the nearest district
+DISTRICT_HQ = {
+    "Almora": (29.5971, 79.6591),
+    "Bageshwar": (29.8404, 79.7694),
+    "Chamoli": (30.4044, 79.3206),
+    "Champawat": (29.3365, 80.0910),
+    "Dehradun": (30.3165, 78.0322),
+    "Haridwar": (29.9457, 78.1642),
+    "Nainital": (29.3803, 79.4636),
+    "Pauri Garhwal": (30.1520, 78.7800),
+    "Pithoragarh": (29.5829, 80.2182),
+    "Rudraprayag": (30.2844, 78.9811),
+    "Tehri Garhwal": (30.3780, 78.4800),
+    "Udham Singh Nagar": (28.9845, 79.4000),
+    "Uttarkashi": (30.7268, 78.4354)
+}
+
+def nearest_district(latitude: float, longitude: float) -> str | None:
+    """Nearest district HQ for points inside Uttarakhand, None outside it."""
+    if not is_valid_coordinate(latitude, longitude):
+        return None
+    min_lat, min_lng, max_lat, max_lng = UTTARAKHAND_BOUNDS
+    if not (min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng):
+        return None
+    scale = math.cos(math.radians(latitude))
+    return min(
+        DISTRICT_HQ,
+        key=lambda d: (DISTRICT_HQ[d][0] - latitude) ** 2 + ((DISTRICT_HQ[d][1] - longitude) * scale) ** 2
+    )
+
+EARTH_RADIUS_M = 6371008.8
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
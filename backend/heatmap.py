@@ -0,0 +1,257 @@
+import os
+import asyncio
+import numpy as np
+from pathlib import Path
+from datetime import datetime, timedelta
+from bson import ObjectId
+from backend.config import (HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM, HEATMAP_MAX_CELLS, HEATMAP_SNAPSHOT_PATH, HEATMAP_SNAPSHOT_SECONDS,
+                            HEATMAP_RECONCILE_SECONDS, HEATMAP_RECONCILE_LAG_SECONDS)
+from backend.geo import UTTARAKHAND_BOUNDS, cluster_cell_size, is_valid_coordinate
+
+LAYERS = ("sos", "reports")
+SNAPSHOT_VERSION = 2
+
+class HeatmapPyramid:
+    """Density counts for SOS alerts and reports on a pyramid of grids over
+    the state, one grid per zoom level with the same cell size as /sos-map
+    clusters. Inserts increment every level, so any viewport is answered
+    from memory.
+
+    A layer's grid counts every document up to its watermark, the newest _id
+    replayed from MongoDB, plus the inserts this process added live since.
+    reconcile() periodically replays past the watermark, which picks up
+    other workers and scripts like import_reports, skips documents already
+    added live, and stops reconcile_lag_seconds behind now so writes still
+    in flight aren't passed. A layer whose document count up to the
+    watermark no longer matches what it counted is rebuilt. Snapshots go to
+    an .npz file without the live inserts; after a restart only documents
+    past the watermark are replayed."""
+
+    def __init__(self, bounds=UTTARAKHAND_BOUNDS, min_zoom: int = HEATMAP_MIN_ZOOM, max_zoom: int = HEATMAP_MAX_ZOOM,
+                 snapshot_path=HEATMAP_SNAPSHOT_PATH, reconcile_lag_seconds: float = HEATMAP_RECONCILE_LAG_SECONDS):
+        self.bounds = tuple(bounds)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.snapshot_path = Path(snapshot_path)
+        self.cell_sizes = {zoom: cluster_cell_size(zoom) for zoom in range(min_zoom, max_zoom + 1)}
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        self.shapes = {
+            zoom: (int(np.ceil((max_lat - min_lat) / cell)), int(np.ceil((max_lng - min_lng) / cell)))
+            for zoom, cell in self.cell_sizes.items()
+        }
+        self.grids = {layer: {zoom: np.zeros(shape, dtype=np.uint32) for zoom, shape in self.shapes.items()} for layer in LAYERS}
+        self.watermarks = {layer: None for layer in LAYERS}
+        # Documents up to the watermark, including ones without a usable location
+        self.counted = {layer: 0 for layer in LAYERS}
+        # Added live and not replayed yet: _id -> (latitude, longitude)
+        self.live = {layer: {} for layer in LAYERS}
+        self.reconcile_lag = reconcile_lag_seconds
+        self.dirty = False
+        self.ready = False
+        # Inserts seen before load() finished; applied after it, minus any the replay counted
+        self._early = []
+        self._task = None
+
+    def add(self, layer: str, latitude, longitude, doc_id=None):
+        """Count a document this process just wrote. Pass its _id so the
+        next replay doesn't count it again."""
+        if not is_valid_coordinate(latitude, longitude):
+            return
+        if not self.ready:
+            self._early.append((layer, latitude, longitude, doc_id))
+            return
+        if doc_id is not None:
+            watermark = self.watermarks[layer]
+            # Behind the replay means already counted, or landing late, which the count check rebuilds for
+            if doc_id in self.live[layer] or (watermark is not None and doc_id <= watermark):
+                return
+            self.live[layer][doc_id] = (latitude, longitude)
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        if not (min_lat <= latitude < max_lat and min_lng <= longitude < max_lng):
+            return
+        for zoom, cell in self.cell_sizes.items():
+            self.grids[layer][zoom][int((latitude - min_lat) / cell), int((longitude - min_lng) / cell)] += 1
+        self.dirty = True
+
+    def _accumulate(self, grids: dict, latitudes, longitudes, subtract: bool = False):
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lng = np.asarray(longitudes, dtype=np.float64)
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        inside = (lat >= min_lat) & (lat < max_lat) & (lng >= min_lng) & (lng < max_lng)
+        lat, lng = lat[inside], lng[inside]
+        for zoom, cell in self.cell_sizes.items():
+            rows = ((lat - min_lat) / cell).astype(np.intp)
+            cols = ((lng - min_lng) / cell).astype(np.intp)
+            (np.subtract.at if subtract else np.add.at)(grids[zoom], (rows, cols), 1)
+
+    def add_many(self, layer: str, latitudes, longitudes):
+        """Vectorised add for rebuilds and replays."""
+        self._accumulate(self.grids[layer], latitudes, longitudes)
+        self.dirty = True
+
+    def _reset(self, layer: str):
+        for grid in self.grids[layer].values():
+            grid.fill(0)
+        self.watermarks[layer] = None
+        self.counted[layer] = 0
+        # Live inserts stay counted; the replay skips them
+        if self.live[layer]:
+            self.add_many(layer, *zip(*self.live[layer].values()))
+        self.dirty = True
+
+    def _layer_grid(self, layer: str, zoom: int) -> np.ndarray:
+        if layer == "all":
+            return sum(self.grids[name][zoom] for name in LAYERS)
+        return self.grids[layer][zoom]
+
+    def query(self, layer: str, zoom: int, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> dict:
+        """Crop of the grid for a viewport, at the requested zoom or coarser
+        if the crop would exceed HEATMAP_MAX_CELLS."""
+        b_min_lat, b_min_lng, _, _ = self.bounds
+        zoom = max(self.min_zoom, min(zoom, self.max_zoom))
+        while True:
+            cell = self.cell_sizes[zoom]
+            rows, cols = self.shapes[zoom]
+            r0 = min(max(int((min_lat - b_min_lat) / cell), 0), rows)
+            r1 = min(max(int(np.ceil((max_lat - b_min_lat) / cell)), 0), rows)
+            c0 = min(max(int((min_lng - b_min_lng) / cell), 0), cols)
+            c1 = min(max(int(np.ceil((max_lng - b_min_lng) / cell)), 0), cols)
+            if (r1 - r0) * (c1 - c0) <= HEATMAP_MAX_CELLS or zoom == self.min_zoom:
+                break
+            zoom -= 1
+        counts = self._layer_grid(layer, zoom)[r0:r1, c0:c1]
+        return {
+            "zoom": zoom,
+            "cell_size": cell,
+            "origin": {"lat": b_min_lat + r0 * cell, "lng": b_min_lng + c0 * cell},
+            "counts": counts
+        }
+
+    def _snapshot_state(self) -> dict:
+        # Copied on the event loop so counts and watermarks are consistent (a few MB, ~1ms)
+        self.dirty = False
+        grids = {layer: {zoom: grid.copy() for zoom, grid in zooms.items()} for layer, zooms in self.grids.items()}
+        for layer, live in self.live.items():
+            # Saved as of the watermark; the replay after a restart counts these again
+            if live:
+                self._accumulate(grids[layer], *zip(*live.values()), subtract=True)
+        return {
+            "meta": np.array([SNAPSHOT_VERSION, *self.bounds, self.min_zoom, self.max_zoom], dtype=np.float64),
+            "watermarks": np.array([str(self.watermarks[layer] or "") for layer in LAYERS]),
+            "counted": np.array([self.counted[layer] for layer in LAYERS], dtype=np.int64),
+            **{f"{layer}_{zoom}": grid for layer, zooms in grids.items() for zoom, grid in zooms.items()}
+        }
+
+    def _write_snapshot(self, state: dict):
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.snapshot_path.with_name(self.snapshot_path.name + ".part.npz")
+        np.savez_compressed(partial, **state)
+        os.replace(partial, self.snapshot_path)
+
+    async def snapshot(self):
+        await asyncio.to_thread(self._write_snapshot, self._snapshot_state())
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path.exists():
+            return False
+        with np.load(self.snapshot_path) as data:
+            expected = np.array([SNAPSHOT_VERSION, *self.bounds, self.min_zoom, self.max_zoom], dtype=np.float64)
+            if not np.array_equal(data["meta"], expected):
+                print("⚠️ Heatmap snapshot is for a different grid, rebuilding")
+                return False
+            for layer in LAYERS:
+                for zoom in self.shapes:
+                    self.grids[layer][zoom] = data[f"{layer}_{zoom}"].astype(np.uint32)
+            for layer, watermark, counted in zip(LAYERS, data["watermarks"], data["counted"]):
+                self.watermarks[layer] = ObjectId(str(watermark)) if watermark else None
+                self.counted[layer] = int(counted)
+        return True
+
+    async def _replay(self, layer: str, collection, until: ObjectId, batch_size: int = 10000):
+        """Count documents past the layer's watermark (all of them after a rebuild) up to until."""
+        query = {"_id": {"$lte": until}}
+        if self.watermarks[layer]:
+            query["_id"]["$gt"] = self.watermarks[layer]
+        cursor = collection.find(query, {"latitude": 1, "longitude": 1}).sort("_id", 1)
+        live = self.live[layer]
+        total = 0
+        while batch := await cursor.to_list(batch_size):
+            points = [
+                (d["latitude"], d["longitude"]) for d in batch
+                if live.pop(d["_id"], None) is None and is_valid_coordinate(d.get("latitude"), d.get("longitude"))
+            ]
+            if points:
+                self.add_many(layer, *zip(*points))
+            self.watermarks[layer] = max(self.watermarks[layer] or batch[-1]["_id"], batch[-1]["_id"])
+            self.counted[layer] += len(batch)
+            total += len(batch)
+        return total
+
+    async def reconcile(self, collections: dict) -> dict:
+        """Replay every layer up to the settle lag, then rebuild any layer whose
+        count up to the watermark drifted (late inserts, deletes)."""
+        until = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=self.reconcile_lag))
+        replayed = {}
+        for layer, collection in collections.items():
+            replayed[layer] = await self._replay(layer, collection, until)
+            if self.watermarks[layer] is None:
+                continue
+            stored = await collection.count_documents({"_id": {"$lte": self.watermarks[layer]}})
+            if stored != self.counted[layer]:
+                print(f"⚠️ Heatmap {layer} layer counted {self.counted[layer]} of {stored} documents, rebuilding")
+                self._reset(layer)
+                replayed[layer] = await self._replay(layer, collection, until)
+        return replayed
+
+    async def load(self, collections: dict):
+        """Restore from the snapshot, or rebuild, then catch up from MongoDB."""
+        try:
+            restored = await asyncio.to_thread(self.load_snapshot)
+        except Exception as e:
+            print(f"⚠️ Heatmap snapshot unreadable, rebuilding: {e}")
+            restored = False
+        try:
+            counts = await self.reconcile(collections)
+            print(f"✅ Heatmap {'restored' if restored else 'rebuilt'}, {counts} documents replayed")
+        except Exception as e:
+            print(f"⚠️ MongoDB unavailable, heatmap has only live inserts: {e}")
+        self.ready = True
+        early, self._early = self._early, []
+        for layer, latitude, longitude, doc_id in early:
+            self.add(layer, latitude, longitude, doc_id)
+
+    async def _run(self, collections: dict, interval: float, snapshot_interval: float):
+        loop = asyncio.get_running_loop()
+        snapshot_at = loop.time() + snapshot_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile(collections)
+            except Exception as e:
+                print(f"⚠️ Heatmap reconcile failed: {e}")
+            if self.dirty and loop.time() >= snapshot_at:
+                snapshot_at = loop.time() + snapshot_interval
+                try:
+                    await self.snapshot()
+                except Exception as e:
+                    print(f"⚠️ Heatmap snapshot failed: {e}")
+
+    def start(self, collections: dict, interval: float = HEATMAP_RECONCILE_SECONDS, snapshot_interval: float = HEATMAP_SNAPSHOT_SECONDS):
+        async def run():
+            await self.load(collections)
+            await self._run(collections, interval, snapshot_interval)
+        if self._task is None:
+            self._task = asyncio.create_task(run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.dirty and self.ready:
+            await self.snapshot()
+
+heatmap = HeatmapPyramid()
@@ -0,0 +1,155 @@
+"""Bulk import of partner agency reports.
+
+    python -m backend.import_reports reports.csv --source "State EOC"
+
+Streams a CSV or JSONL file, classifies rows in large batches with the tweet
+model and writes them with unordered insert_many. Progress is checkpointed
+after every batch, so re-running the same command resumes where it stopped.
+
+Rows are keyed by a hash of the file's contents (or --import-id), so the same
+file imported twice is skipped row for row, while a different file with the
+same name is imported normally.
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from itertools import islice
+from pathlib import Path
+from pymongo.errors import BulkWriteError
+from backend import ml_model
+from backend.database import reports_collection, ensure_import_index
+
+DUPLICATE_KEY = 11000
+
+def iter_rows(path: Path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def file_import_id(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def build_report(row: dict, row_number: int, label: int, import_id: str, source: str | None) -> dict:
+    return {
+        "reporter": row.get("reporter") or source or "import",
+        "text": row.get("text") or "",
+        "latitude": to_float(row.get("latitude")),
+        "longitude": to_float(row.get("longitude")),
+        "severity": row.get("severity"),
+        "disaster_type": row.get("disaster_type"),
+        "photo_path": None,
+        "voice_note_path": None,
+        "label": label,
+        "label_name": "disaster" if label == 1 else "not disaster",
+        "source": source,
+        # Unique per file row so a replayed batch can't create duplicates
+        "import_id": f"{import_id}:{row_number}"
+    }
+
+def load_checkpoint(path: Path, import_id: str) -> int:
+    if not path.exists():
+        return 0
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get("import_id") != import_id:
+        print(f"⚠️ {path.name} belongs to a different import, starting from the first row")
+        return 0
+    return checkpoint.get("rows", 0)
+
+def save_checkpoint(path: Path, rows: int, import_id: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"rows": rows, "import_id": import_id}))
+    os.replace(tmp, path)
+
+async def insert_chunks(docs: list[dict], chunk_size: int, collection) -> tuple[int, int]:
+    """Returns (inserted, duplicates)."""
+    inserted = duplicates = 0
+    for start in range(0, len(docs), chunk_size):
+        try:
+            result = await collection.insert_many(docs[start:start + chunk_size], ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Rows already written by an earlier or interrupted run show up as duplicate keys
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            duplicates += len(errors)
+    return inserted, duplicates
+
+async def import_reports(path, batch_size: int = 10000, chunk_size: int = 1000, source: str | None = None, checkpoint_path=None, restart: bool = False, collection=reports_collection, import_id: str | None = None) -> dict:
+    path = Path(path)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path else path.with_name(path.name + ".checkpoint")
+    import_id = import_id or await asyncio.to_thread(file_import_id, path)
+    if ml_model.model is None:
+        ml_model.load_model()
+    # Resuming from the checkpoint is only idempotent with the unique import_id index, so no index, no import
+    await ensure_import_index(collection)
+
+    skip = 0 if restart else load_checkpoint(checkpoint_path, import_id)
+    if skip:
+        print(f"↩️ Resuming {path.name} after row {skip}")
+    rows = islice(iter_rows(path), skip, None)
+    done, inserted, duplicates = skip, 0, 0
+    start = time.perf_counter()
+
+    async def classify(batch):
+        return await asyncio.to_thread(ml_model.predict_batch, [row.get("text") or "" for row in batch])
+
+    # Classify the next batch in a worker thread while the current one is being inserted
+    batch = list(islice(rows, batch_size))
+    labels_task = asyncio.ensure_future(classify(batch)) if batch else None
+    while batch:
+        labels = await labels_task
+        next_batch = list(islice(rows, batch_size))
+        labels_task = asyncio.ensure_future(classify(next_batch)) if next_batch else None
+
+        docs = [build_report(row, done + i, label, import_id, source) for i, (row, label) in enumerate(zip(batch, labels))]
+        chunk_inserted, chunk_duplicates = await insert_chunks(docs, chunk_size, collection)
+        inserted += chunk_inserted
+        duplicates += chunk_duplicates
+        done += len(batch)
+        save_checkpoint(checkpoint_path, done, import_id)
+
+        elapsed = time.perf_counter() - start
+        print(f"📥 {done} rows ({inserted} inserted, {duplicates} already imported) - {(done - skip) / elapsed:.0f} rows/s")
+        batch = next_batch
+
+    elapsed = time.perf_counter() - start
+    stats = {"import_id": import_id, "rows": done - skip, "inserted": inserted, "duplicates": duplicates, "seconds": round(elapsed, 2), "rows_per_second": round((done - skip) / elapsed) if elapsed else 0}
+    if duplicates:
+        print(f"⚠️ {duplicates} rows were already imported under {import_id} and were skipped")
+    print(f"✅ Import finished: {stats}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import reports from a CSV or JSONL file")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file of reports")
+    parser.add_argument("--source", help="Partner agency the reports came from")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows classified per model call")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Documents per insert_many")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the first row")
+    parser.add_argument("--import-id", help="Key for this import's rows (default: hash of the file contents)")
+    args = parser.parse_args()
+    asyncio.run(import_reports(args.path, args.batch_size, args.chunk_size, args.source, args.checkpoint, args.restart, import_id=args.import_id))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime, date
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from backend.config import JSON_STREAM_BATCH_SIZE
+
+# orjson is optional: several times faster and encodes datetimes natively
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+class JSONArrayStream:
+    """Encodes a Motor cursor (or any iterable) as a JSON array, one chunk
+    per batch_size documents. count is final once the stream is exhausted."""
+
+    def __init__(self, source, transform=None, batch_size: int = JSON_STREAM_BATCH_SIZE):
+        self.source = source
+        self.transform = transform
+        self.batch_size = batch_size
+        self.count = 0
+        self._head = []
+
+    async def prime(self):
+        """Fetch the first batch now, so database errors surface before the
+        response has started and can still become an error response."""
+        if hasattr(self.source, "to_list"):
+            self._head = await self.source.to_list(self.batch_size)
+        return self
+
+    async def _documents(self):
+        for doc in self._head:
+            yield doc
+        self._head = []
+        if hasattr(self.source, "__aiter__"):
+            async for doc in self.source:
+                yield doc
+        else:
+            for doc in self.source:
+                yield doc
+
+    async def __aiter__(self):
+        yield b"["
+        chunk = []
+        async for doc in self._documents():
+            if self.transform is not None:
+                doc = self.transform(doc)
+            chunk.append(dumps(doc))
+            if len(chunk) >= self.batch_size:
+                yield (b"," if self.count else b"") + b",".join(chunk)
+                self.count += len(chunk)
+                chunk = []
+        if chunk:
+            yield (b"," if self.count else b"") + b",".join(chunk)
+            self.count += len(chunk)
+        yield b"]"
+
+async def iter_json(value):
+    """JSON bytes for value. Dicts are walked so JSONArrayStream values stream
+    in place, and callables are evaluated only when their key is reached."""
+    if isinstance(value, JSONArrayStream):
+        async for chunk in value:
+            yield chunk
+    elif isinstance(value, dict) and any(isinstance(v, (JSONArrayStream, dict)) or callable(v) for v in value.values()):
+        yield b"{"
+        for i, (key, item) in enumerate(value.items()):
+            yield (b"," if i else b"") + dumps(str(key)) + b":"
+            async for chunk in iter_json(item() if callable(item) else item):
+                yield chunk
+        yield b"}"
+    else:
+        yield dumps(value)
+
+def json_stream_response(content, status_code: int = 200, headers: dict | None = None) -> StreamingResponse:
+    return StreamingResponse(iter_json(content), status_code=status_code, media_type="application/json", headers=headers)
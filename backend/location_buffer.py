@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+from backend.config import LOCATION_FLUSH_INTERVAL_MS, LOCATION_MAX_CLOCK_SKEW_SECONDS
+from backend.agency_index import agency_index
+from backend.agency_directory import agency_directory
+from backend.location_history import location_history
+
+def to_utc_naive(value: datetime) -> datetime:
+    # Stored datetimes are naive UTC, like datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class LocationBuffer:
+    """Latest GPS fix per agency, written to MongoDB in periodic bulk_writes.
+
+    Pings only touch memory: the agency must be in the known id set, and a
+    fix older than the one already held is dropped. A fix stamped further in
+    the future than the allowed clock skew gets the server time instead, so
+    a device with a wrong clock can't pin the agency's position. Every flush sends one
+    update per agency that moved since the last flush, guarded so an older
+    fix from another worker can't overwrite a newer one, and appends the
+    accepted fixes to the agency's location history in the same pass."""
+
+    # Fixes kept per agency while history writes are failing
+    max_pending_history = 3600
+
+    def __init__(self, flush_interval_ms: float = LOCATION_FLUSH_INTERVAL_MS, max_clock_skew_seconds: float = LOCATION_MAX_CLOCK_SKEW_SECONDS):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_clock_skew = timedelta(seconds=max_clock_skew_seconds)
+        self.collection = None
+        self.known_ids: set[str] = set()
+        self.latest: dict[str, dict] = {}
+        self.dirty: set[str] = set()
+        self.history: dict[str, list[dict]] = {}
+        self.ready = False
+        self.stats = {"accepted": 0, "stale": 0, "clamped": 0, "flushes": 0, "written": 0, "flush_errors": 0}
+        self._task = None
+
+    async def start(self, collection):
+        self.collection = collection
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.dirty or self.history:
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Dropping {len(self.dirty)} unsaved agency locations: {e}")
+
+    async def load_ids(self):
+        ids = await self.collection.distinct("_id")
+        self.known_ids = {str(agency_id) for agency_id in ids}
+        self.ready = True
+        print(f"✅ Location buffer tracking {len(self.known_ids)} agencies")
+
+    async def exists(self, agency_id: str) -> bool:
+        if agency_id in self.known_ids:
+            return True
+        # Registered through another worker, or the id set isn't loaded yet
+        if await self.collection.find_one({"_id": ObjectId(agency_id)}, {"_id": 1}):
+            self.known_ids.add(agency_id)
+            return True
+        return False
+
+    def add_agency(self, agency_id: str):
+        self.known_ids.add(agency_id)
+
+    def remove_agency(self, agency_id: str):
+        self.known_ids.discard(agency_id)
+        self.latest.pop(agency_id, None)
+        self.dirty.discard(agency_id)
+        self.history.pop(agency_id, None)
+
+    def accept(self, agency_id: str, fix: dict) -> bool:
+        """Keep fix if it is newer than the one held for the agency."""
+        now = datetime.utcnow()
+        fix["timestamp"] = to_utc_naive(fix.get("timestamp") or now)
+        if fix["timestamp"] > now + self.max_clock_skew:
+            fix["timestamp"] = now
+            self.stats["clamped"] += 1
+        current = self.latest.get(agency_id)
+        if current is not None and fix["timestamp"] < current["timestamp"]:
+            self.stats["stale"] += 1
+            return False
+        self.latest[agency_id] = fix
+        self.dirty.add(agency_id)
+        self.history.setdefault(agency_id, []).append(fix)
+        self.stats["accepted"] += 1
+        agency_index.move(agency_id, fix["latitude"], fix["longitude"])
+        return True
+
+    @staticmethod
+    def _fields(fix: dict) -> dict:
+        return {
+            "latitude": fix["latitude"],
+            "longitude": fix["longitude"],
+            "last_updated": fix["timestamp"],
+            "location_timestamp": fix["timestamp"],
+            "location_accuracy": fix.get("accuracy"),
+            "location_speed": fix.get("speed"),
+            "location_heading": fix.get("heading")
+        }
+
+    def _update(self, agency_id: str, fix: dict) -> UpdateOne:
+        timestamp = fix["timestamp"]
+        # A future location_timestamp stored before fixes were clamped is overwritten too
+        future = datetime.utcnow() + self.max_clock_skew
+        return UpdateOne(
+            {"_id": ObjectId(agency_id), "$or": [
+                {"location_timestamp": {"$lte": timestamp}},
+                {"location_timestamp": {"$gt": future}},
+                {"location_timestamp": {"$exists": False}}
+            ]},
+            {"$set": self._fields(fix)}
+        )
+
+    def _requeue_history(self, history: dict[str, list[dict]]):
+        for agency_id, fixes in history.items():
+            if agency_id in self.known_ids:
+                self.history[agency_id] = (fixes + self.history.get(agency_id, []))[-self.max_pending_history:]
+
+    def pending_history(self, agency_id: str) -> list[dict]:
+        return list(self.history.get(agency_id, ()))
+
+    async def flush(self):
+        if not self.dirty and not self.history:
+            return
+        batch, self.dirty = self.dirty, set()
+        history, self.history = self.history, {}
+        fixes = {agency_id: self.latest[agency_id] for agency_id in batch if agency_id in self.latest}
+        try:
+            if fixes:
+                await self.collection.bulk_write([self._update(agency_id, fix) for agency_id, fix in fixes.items()], ordered=False)
+        except Exception:
+            # Retried next tick with whatever fix is newest by then
+            self.dirty |= set(fixes)
+            self._requeue_history(history)
+            raise
+        if fixes:
+            await agency_directory.apply_locations({agency_id: self._fields(fix) for agency_id, fix in fixes.items()})
+        try:
+            await location_history.write(history)
+        except Exception:
+            # A partly applied batch is pushed again; readers drop the repeated points
+            self._requeue_history(history)
+            raise
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(fixes)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        retry_load_at = 0.0
+        while True:
+            if not self.ready and loop.time() >= retry_load_at:
+                try:
+                    await self.load_ids()
+                except Exception as e:
+                    print(f"⚠️ MongoDB unavailable, agency existence checks go to the database: {e}")
+                    retry_load_at = loop.time() + 30
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                print(f"⚠️ Agency location flush failed, retrying: {e}")
+
+location_buffer = LocationBuffer()
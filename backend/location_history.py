@@ -0,0 +1,189 @@
+import zlib
+import asyncio
+import numpy as np
+from datetime import datetime, timedelta
+from bson import ObjectId, Binary
+from pymongo import UpdateOne, ASCENDING
+from backend.config import LOCATION_HISTORY_SEAL_MINUTES
+from backend.geo import EARTH_RADIUS_M
+
+# Points are stored as int32: ms since the start of the hour, degrees * 1e6
+# (~0.1m) and speed in cm/s, with -1 for a ping that had no speed
+COORD_SCALE = 1e6
+SPEED_SCALE = 100
+NO_SPEED = -1
+FIELDS = ("t", "lat", "lon", "spd")
+EPOCH = datetime(1970, 1, 1)
+
+def epoch_ms(timestamp: datetime) -> int:
+    # Timestamps are naive UTC; datetime.timestamp() would read them as local time
+    return (timestamp - EPOCH) // timedelta(milliseconds=1)
+
+def hour_of(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def encode_fix(hour: datetime, timestamp: datetime, latitude: float, longitude: float, speed) -> tuple:
+    return (
+        epoch_ms(timestamp) - epoch_ms(hour),
+        round(latitude * COORD_SCALE),
+        round(longitude * COORD_SCALE),
+        NO_SPEED if speed is None else round(speed * SPEED_SCALE)
+    )
+
+def pack(points: np.ndarray) -> bytes:
+    """Delta-encode each column, shuffle bytes so the mostly-zero high bytes
+    sit together, and deflate. A steadily moving vehicle packs to a few
+    bytes per point."""
+    deltas = np.ascontiguousarray(np.diff(points, axis=1, prepend=0), dtype="<i4")
+    return zlib.compress(deltas.view(np.uint8).reshape(-1, 4).T.tobytes(), 6)
+
+def unpack(data: bytes) -> np.ndarray:
+    raw = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+    deltas = raw.reshape(4, -1).T.copy().view("<i4").reshape(len(FIELDS), -1)
+    return np.cumsum(deltas, axis=1, dtype=np.int64)
+
+def bucket_points(doc: dict) -> np.ndarray:
+    """(4, n) array of a bucket's points, packed and not yet packed,
+    sorted by time with repeats from retried writes dropped."""
+    parts = []
+    if doc.get("packed"):
+        parts.append(unpack(doc["packed"]))
+    if doc.get("t"):
+        parts.append(np.array([doc[field] for field in FIELDS], dtype=np.int64))
+    if not parts:
+        return np.empty((len(FIELDS), 0), dtype=np.int64)
+    points = np.concatenate(parts, axis=1)
+    _, first = np.unique(points[0], return_index=True)
+    return points[:, first]
+
+def downsample(count: int, max_points: int) -> np.ndarray:
+    """Indices of an evenly spaced subset that keeps the first and last point."""
+    if count <= max_points:
+        return np.arange(count)
+    return np.unique(np.linspace(0, count - 1, max_points).round().astype(np.intp))
+
+class LocationHistory:
+    """Agency location history in time-bucketed documents, one per agency
+    per hour. Pings are appended as parallel int arrays by the location
+    buffer's flush, one upsert per agency per flush; once an hour is over
+    its arrays are packed into a single compressed binary field."""
+
+    def __init__(self, seal_minutes: float = LOCATION_HISTORY_SEAL_MINUTES):
+        self.seal_after = timedelta(minutes=seal_minutes)
+        self.collection = None
+        self._task = None
+
+    def start(self, collection, interval: float = 300):
+        async def run():
+            try:
+                await collection.create_index([("agency_id", ASCENDING), ("hour", ASCENDING)], unique=True)
+                # Only buckets not packed yet, which is what seal() scans for
+                await collection.create_index([("hour", ASCENDING)], name="hour_unsealed", partialFilterExpression={"t": {"$exists": True}})
+            except Exception as e:
+                print(f"⚠️ Could not create location history indexes: {e}")
+            await self._run(interval)
+        self.collection = collection
+        if self._task is None:
+            self._task = asyncio.create_task(run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def updates(self, agency_id: str, fixes: list[dict]) -> list[UpdateOne]:
+        """One $push upsert per hour the fixes fall in."""
+        by_hour = {}
+        for fix in fixes:
+            hour = hour_of(fix["timestamp"])
+            by_hour.setdefault(hour, []).append(encode_fix(hour, fix["timestamp"], fix["latitude"], fix["longitude"], fix.get("speed")))
+        requests = []
+        for hour, points in by_hour.items():
+            columns = list(zip(*points))
+            requests.append(UpdateOne(
+                {"agency_id": ObjectId(agency_id), "hour": hour},
+                {
+                    "$push": {field: {"$each": list(column)} for field, column in zip(FIELDS, columns)},
+                    "$inc": {"n": len(points)}
+                },
+                upsert=True
+            ))
+        return requests
+
+    async def write(self, pending: dict[str, list[dict]]):
+        if self.collection is None or not pending:
+            return
+        requests = [request for agency_id, fixes in pending.items() for request in self.updates(agency_id, fixes)]
+        await self.collection.bulk_write(requests, ordered=False)
+
+    async def seal(self, now: datetime | None = None) -> int:
+        """Pack the arrays of buckets whose hour ended more than seal_minutes ago.
+        A bucket that got another push meanwhile fails the n check and is
+        packed on the next pass."""
+        cutoff = (now or datetime.utcnow()) - self.seal_after - timedelta(hours=1)
+        sealed = 0
+        async for doc in self.collection.find({"hour": {"$lte": cutoff}, "t": {"$exists": True}}):
+            points = bucket_points(doc)
+            result = await self.collection.update_one(
+                {"_id": doc["_id"], "n": doc["n"]},
+                {"$set": {"packed": Binary(pack(points)), "n": points.shape[1]}, "$unset": {field: "" for field in FIELDS}}
+            )
+            sealed += result.modified_count
+        return sealed
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.seal()
+            except Exception as e:
+                print(f"⚠️ Location history packing failed: {e}")
+
+    async def trajectory(self, agency_id: str, start: datetime, end: datetime, max_points: int, pending=()) -> dict:
+        """Points between start and end, downsampled to max_points. pending are
+        fixes not flushed to MongoDB yet."""
+        columns = []
+        async for doc in self.collection.find({"agency_id": ObjectId(agency_id), "hour": {"$gte": hour_of(start), "$lte": end}}):
+            points = bucket_points(doc)
+            # Absolute ms since the epoch, so buckets can be merged and sorted
+            points[0] += epoch_ms(doc["hour"])
+            columns.append(points)
+        if pending:
+            columns.append(np.array(
+                [encode_fix(EPOCH, fix["timestamp"], fix["latitude"], fix["longitude"], fix.get("speed")) for fix in pending],
+                dtype=np.int64
+            ).T)
+
+        points = np.concatenate(columns, axis=1) if columns else np.empty((len(FIELDS), 0), dtype=np.int64)
+        start_ms, end_ms = epoch_ms(start), epoch_ms(end)
+        points = points[:, (points[0] >= start_ms) & (points[0] <= end_ms)]
+        _, first = np.unique(points[0], return_index=True)
+        points = points[:, first]
+
+        lat, lon = np.radians(points[1] / COORD_SCALE), np.radians(points[2] / COORD_SCALE)
+        a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+        distance_m = float(np.sum(2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))))
+
+        sample = points[:, downsample(points.shape[1], max_points)]
+        return {
+            "agency_id": agency_id,
+            "start": start,
+            "end": end,
+            "total_points": int(points.shape[1]),
+            "distance_km": round(distance_m / 1000, 3),
+            "points": [
+                {
+                    "timestamp": EPOCH + timedelta(milliseconds=t),
+                    "latitude": la / COORD_SCALE,
+                    "longitude": lo / COORD_SCALE,
+                    "speed": None if spd == NO_SPEED else spd / SPEED_SCALE
+                }
+                for t, la, lo, spd in sample.T.tolist()
+            ]
+        }
+
+location_history = LocationHistory()
@@ -0,0 +1,98 @@
+import os
+import asyncio
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from fastapi import UploadFile, HTTPException
+from pymongo import ReturnDocument
+from backend.config import MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE, MEDIA_ROOT
+from backend.database import media_blobs_collection
+from backend.uploads import validate_upload_type
+
+def blob_path(digest: str) -> Path:
+    # Two levels of hash-prefix shards keep directories small
+    return Path(MEDIA_ROOT) / digest[:2] / digest[2:4] / digest
+
+def is_valid_digest(digest: str) -> bool:
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+async def hash_upload(upload: UploadFile, max_size: int) -> tuple[str, int]:
+    """First pass over the spooled upload: SHA-256 and size, enforcing max_size."""
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds {max_size // (1024 * 1024)}MB limit")
+        await asyncio.to_thread(digest.update, chunk)
+    return digest.hexdigest(), size
+
+async def write_blob(upload: UploadFile, path: Path):
+    """Second pass, only for blobs not on disk yet: stream to a temp file and
+    rename into place so readers never see a partial blob."""
+    await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+    partial_path = path.with_name(f"{path.name}.{os.getpid()}.{id(upload)}.part")
+    buffer = await asyncio.to_thread(open, partial_path, "wb")
+    try:
+        await upload.seek(0)
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(buffer.write, chunk)
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(os.replace, partial_path, path)
+    except BaseException:
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(partial_path.unlink, missing_ok=True)
+        raise
+
+async def store_upload(upload: UploadFile, allowed_types: list[str], max_size: int = MAX_FILE_SIZE) -> dict:
+    """Store an upload once per unique content and take a reference on it."""
+    content_type = validate_upload_type(upload, allowed_types)
+    digest, size = await hash_upload(upload, max_size)
+    path = blob_path(digest)
+    # Take the reference first so a concurrent release can't delete the blob under us
+    await media_blobs_collection.update_one(
+        {"_id": digest},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {"size": size, "content_type": content_type, "path": str(path), "created_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+    if not await asyncio.to_thread(path.exists):
+        try:
+            await write_blob(upload, path)
+        except BaseException:
+            await release_blob(digest)
+            raise
+    return {"hash": digest, "path": str(path), "size": size, "content_type": content_type}
+
+async def release_blob(digest: str | None):
+    """Drop one reference and delete the blob once nothing points at it."""
+    if not digest:
+        return
+    blob = await media_blobs_collection.find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refs": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob and blob.get("refs", 0) <= 0:
+        # Move the file aside before dropping the document: a store_upload that takes a new
+        # reference in between fails the conditional delete, and the file is put back
+        path = blob_path(digest)
+        tombstone = path.with_name(f"{path.name}.{os.getpid()}.{id(blob)}.deleted")
+        try:
+            await asyncio.to_thread(os.replace, path, tombstone)
+        except FileNotFoundError:
+            tombstone = None
+        result = await media_blobs_collection.delete_one({"_id": digest, "refs": {"$lte": 0}})
+        if tombstone is None:
+            return
+        if result.deleted_count:
+            await asyncio.to_thread(tombstone.unlink, missing_ok=True)
+        else:
+            # Same content, so replacing a copy the new uploader already wrote is harmless
+            await asyncio.to_thread(os.replace, tombstone, path)
+
+async def get_blob(digest: str) -> dict | None:
+    return await media_blobs_collection.find_one({"_id": digest})
@@ -0,0 +1,160 @@
+import csv
+import json
+import codecs
+import asyncio
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import StreamingResponse
+from backend.ml_model import predict_batch, prediction_cache, model_info
+from backend.config import CLASSIFY_STREAM_BATCH_SIZE
+
+router = APIRouter()
+
+LABEL_NAMES = {1: "disaster", 0: "not disaster"}
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that starts sending while the request body is still
+    being read. The stock class listens on receive() for disconnects, which
+    would swallow the body chunks the generator is waiting for."""
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def iter_lines(request: Request):
+    """Yield lists of complete lines as the request body arrives."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    remainder = ""
+    async for chunk in request.stream():
+        text = remainder + decoder.decode(chunk)
+        lines = text.split("\n")
+        remainder = lines.pop()
+        if lines:
+            yield lines
+    remainder += decoder.decode(b"", final=True)
+    if remainder:
+        yield [remainder]
+
+async def iter_ndjson_records(request: Request, text_field: str):
+    index = 0
+    async for lines in iter_lines(request):
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                records.append((index, None, None, "Invalid JSON"))
+                index += 1
+                continue
+            if isinstance(item, str):
+                records.append((index, None, item, None))
+            elif isinstance(item, dict) and isinstance(item.get(text_field), str):
+                records.append((index, item.get("id"), item[text_field], None))
+            else:
+                records.append((index, None, None, f"Missing '{text_field}' field"))
+            index += 1
+        if records:
+            yield records
+
+async def iter_csv_records(request: Request, text_field: str):
+    index = 0
+    columns = None  # (text column, id column) once the header has been read
+    pending = []  # lines of a record whose quoted field spans chunks
+
+    def parse(complete):
+        nonlocal index, columns
+        records = []
+        for row in csv.reader(complete):
+            if not row:
+                continue
+            if columns is None:
+                if text_field not in row:
+                    return None
+                columns = (row.index(text_field), row.index("id") if "id" in row else None)
+                continue
+            text_col, id_col = columns
+            record_id = row[id_col] if id_col is not None and id_col < len(row) else None
+            if text_col < len(row):
+                records.append((index, record_id, row[text_col], None))
+            else:
+                records.append((index, record_id, None, f"Missing '{text_field}' column"))
+            index += 1
+        return records
+
+    async for lines in iter_lines(request):
+        complete = []
+        for line in lines:
+            pending.append(line + "\n")
+            # A record is complete once its quotes are balanced ("" escapes come in pairs)
+            if sum(part.count('"') for part in pending) % 2 == 0:
+                complete.append("".join(pending))
+                pending = []
+        records = parse(complete)
+        if records is None:
+            yield [(0, None, None, f"CSV header has no '{text_field}' column")]
+            return
+        if records:
+            yield records
+    if pending:
+        # Unterminated quote at the end of the body, parse whatever is there
+        records = parse(["".join(pending)])
+        if records:
+            yield records
+
+async def iter_batches(records, batch_size: int):
+    batch = []
+    async for chunk in records:
+        batch.extend(chunk)
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+def encode_results(batch, labels) -> bytes:
+    out = []
+    labels = iter(labels)
+    for index, record_id, text, error in batch:
+        item = {"index": index}
+        if record_id is not None:
+            item["id"] = record_id
+        if error is not None:
+            item["error"] = error
+        else:
+            label = next(labels)
+            item["label"] = label
+            item["label_name"] = LABEL_NAMES.get(label, str(label))
+        out.append(json.dumps(item))
+    return ("\n".join(out) + "\n").encode()
+
+async def classify_stream(records, batch_size: int):
+    # Classify batch N in a worker thread while batch N+1 is being parsed
+    pending = None
+    async for batch in iter_batches(records, batch_size):
+        texts = [text for _, _, text, error in batch if error is None]
+        task = asyncio.ensure_future(asyncio.to_thread(predict_batch, texts))
+        if pending is not None:
+            yield encode_results(pending[0], await pending[1])
+        pending = (batch, task)
+    if pending is not None:
+        yield encode_results(pending[0], await pending[1])
+
+@router.post("/classify/stream")
+async def classify_bulk(
+    request: Request,
+    format: str | None = Query(None, pattern="^(ndjson|csv)$"),
+    text_field: str = Query("text"),
+    batch_size: int = Query(CLASSIFY_STREAM_BATCH_SIZE, ge=1, le=50000)
+):
+    """Classify an NDJSON or CSV body of texts and stream the labels back as NDJSON"""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    records = iter_csv_records(request, text_field) if format == "csv" else iter_ndjson_records(request, text_field)
+    return DuplexStreamingResponse(classify_stream(records, batch_size), media_type="application/x-ndjson")
+
+@router.get("/classify/stats")
+async def classify_stats():
+    """Loaded model details and prediction cache counters"""
+    return {"model": model_info, "prediction_cache": prediction_cache.stats()}
@@ -0,0 +1,39 @@
+import numpy as np
+from fastapi import APIRouter, Query
+from backend.heatmap import heatmap, LAYERS
+from backend.geo import UTTARAKHAND_BOUNDS
+
+router = APIRouter()
+
+@router.get("/heatmap")
+async def get_heatmap(
+    layer: str = Query("all", pattern=f"^({'|'.join(LAYERS)}|all)$"),
+    zoom: int = Query(8, ge=0, le=22),
+    min_lat: float = Query(UTTARAKHAND_BOUNDS[0], ge=-90, le=90),
+    min_lng: float = Query(UTTARAKHAND_BOUNDS[1], ge=-180, le=180),
+    max_lat: float = Query(UTTARAKHAND_BOUNDS[2], ge=-90, le=90),
+    max_lng: float = Query(UTTARAKHAND_BOUNDS[3], ge=-180, le=180),
+    format: str = Query("points", pattern="^(points|matrix)$")
+):
+    """Distress density for a viewport, served from the in-memory grid pyramid"""
+    grid = heatmap.query(layer, zoom, min_lat, min_lng, max_lat, max_lng)
+    counts = grid.pop("counts")
+    result = {
+        "layer": layer,
+        **grid,
+        "max": int(counts.max()) if counts.size else 0,
+        "ready": heatmap.ready
+    }
+    if format == "matrix":
+        # Row 0 is the southernmost row, starting at origin
+        result["rows"], result["cols"] = counts.shape
+        result["counts"] = counts.tolist()
+        return result
+    # Cell centres with their counts, e.g. for a Leaflet heat layer
+    rows, cols = np.nonzero(counts)
+    cell, origin = grid["cell_size"], grid["origin"]
+    result["points"] = [
+        [origin["lat"] + (r + 0.5) * cell, origin["lng"] + (c + 0.5) * cell, int(counts[r, c])]
+        for r, c in zip(rows.tolist(), cols.tolist())
+    ]
+    return result
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response, FileResponse
+from backend.media_store import blob_path, get_blob, is_valid_digest
+
+router = APIRouter()
+
+@router.get("/media/{digest}")
+async def get_media(digest: str, request: Request):
+    """Serve an uploaded photo or voice note by its content hash"""
+    if not is_valid_digest(digest):
+        raise HTTPException(status_code=404, detail="Media not found")
+    # Content never changes for a given hash, so the hash is the ETag and it can be cached forever
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    blob = await get_blob(digest)
+    path = blob_path(digest)
+    if not blob or not path.exists():
+        raise HTTPException(status_code=404, detail="Media not found")
+    return FileResponse(path, media_type=blob.get("content_type"), headers=headers)
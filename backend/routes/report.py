@@ -1,9 +1,13 @@
-import os
 from bson import ObjectId
 from backend.models import DisasterReport
-from backend.ml_model import predict_text
-from backend.database import reports_collection
-from fastapi import APIRouter, Form, UploadFile, File
+from backend.batch_classifier import classifier
+from backend.database import reports_collection, get_reports as fetch_reports
+from backend.config import ALLOWED_IMAGE_TYPES, ALLOWED_AUDIO_TYPES
+from backend.uploads import validate_upload_type
+from backend.media_store import store_upload, release_blob
+from backend.heatmap import heatmap
+from backend.json_stream import JSONArrayStream, json_stream_response
+from fastapi import APIRouter, Form, UploadFile, File, Query, HTTPException
 
 router = APIRouter()
 
@@ -11,22 +15,34 @@ router = APIRouter()
 async def create_report(reporter: str = Form(...), text: str = Form(...), latitude: float = Form(...), longitude: float = Form(...), severity: str = Form(...), disaster_type: str = Form(...), photo: UploadFile | None = File(None), voice_note: UploadFile | None = File(None) ):
     if not all([reporter, text, latitude, longitude]):
         return {"error": "Missing required fields: reporter, text, latitude, longitude"}
-    photo_path = None
-    voice_path = None
+    # Check both types before writing anything so a rejected voice note doesn't leave an orphan photo
     if photo:
-        photo_path = f"uploads/photos/{photo.filename}"
-        os.makedirs("uploads/photos", exist_ok=True)
-        with open(photo_path, "wb") as buffer:
-            buffer.write(await photo.read())
+        validate_upload_type(photo, ALLOWED_IMAGE_TYPES)
     if voice_note:
-        voice_path = f"uploads/voices/{voice_note.filename}"
-        os.makedirs("uploads/voices", exist_ok=True)
-        with open(voice_path, "wb") as buffer:
-            buffer.write(await voice_note.read())
-    prediction = predict_text(text)
-    label_name = "disaster" if prediction == 1 else "not disaster"
-    data = { "reporter": reporter, "text": text, "latitude": latitude, "longitude": longitude, "severity": severity, "disaster_type": disaster_type, "photo_path": photo_path, "voice_note_path": voice_path, "label": int(prediction), "label_name": label_name }
-    result = await reports_collection.insert_one(data)
+        validate_upload_type(voice_note, ALLOWED_AUDIO_TYPES)
+    # Media is content-addressed: identical files share one blob on disk
+    photo_hash = photo_path = voice_hash = voice_path = None
+    if photo:
+        blob = await store_upload(photo, ALLOWED_IMAGE_TYPES)
+        photo_hash, photo_path = blob["hash"], blob["path"]
+    if voice_note:
+        try:
+            blob = await store_upload(voice_note, ALLOWED_AUDIO_TYPES)
+        except Exception:
+            await release_blob(photo_hash)
+            raise
+        voice_hash, voice_path = blob["hash"], blob["path"]
+    try:
+        prediction = await classifier.classify(text)
+        label_name = "disaster" if prediction == 1 else "not disaster"
+        data = { "reporter": reporter, "text": text, "latitude": latitude, "longitude": longitude, "severity": severity, "disaster_type": disaster_type, "photo_hash": photo_hash, "photo_path": photo_path, "voice_note_hash": voice_hash, "voice_note_path": voice_path, "label": int(prediction), "label_name": label_name }
+        result = await reports_collection.insert_one(data)
+    except BaseException:
+        # No report references the blobs, so give back the references store_upload took
+        await release_blob(photo_hash)
+        await release_blob(voice_hash)
+        raise
+    heatmap.add("reports", latitude, longitude, result.inserted_id)
     return {
         "message": "Report submitted",
         "id": str(result.inserted_id),
@@ -34,8 +50,19 @@ async def create_report(reporter: str = Form(...), text: str = Form(...), latitu
     }
 
 @router.get("/reports")
-async def get_reports():
-    reports = await reports_collection.find().to_list(100)
-    for r in reports:
-        r["_id"] = str(r["_id"])
-    return reports
\ No newline at end of file
+async def get_reports(
+    limit: int = Query(100, ge=1, le=500),
+    after: str | None = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    label: int | None = None,
+    severity: str | None = None,
+    disaster_type: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated fields to return")
+):
+    if after and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    projection = [f.strip() for f in fields.split(",") if f.strip() and not f.strip().startswith("$")] if fields else None
+    filters = {"label": label, "severity": severity, "disaster_type": disaster_type}
+    reports, next_cursor = await fetch_reports(limit, after, filters, projection)
+    # Body stays a plain list for existing clients, the next page cursor travels in a header
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_stream_response(await JSONArrayStream(reports).prime(), headers=headers)
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from typing import List, Optional
 from datetime import datetime, timedelta
 import motor.motor_asyncio
@@ -7,6 +9,13 @@ from bson import ObjectId
 import json
 import bcrypt
 import jwt
+from backend.agency_index import agency_index
+from backend.agency_directory import agency_directory, PUBLIC_PROJECTION
+from backend.database import get_agencies
+from backend.json_stream import JSONArrayStream, json_stream_response
+from backend.location_buffer import location_buffer, to_utc_naive
+from backend.location_history import location_history
+from backend.config import LOCATION_HISTORY_MAX_POINTS, AGENCY_BULK_MAX_ITEMS
 
 router = APIRouter()
 
@@ -15,6 +24,15 @@ client = motor.motor_asyncio.AsyncIOMotorClient("mongodb://localhost:27017")
 db = client.disaster_management
 agencies_collection = db.rescue_agencies
 
+async def agencies_changed(agency_ids: list[str]):
+    """Update the caches after a committed write. The directory copies go
+    first; an index refresh that fails is logged, not turned into a 500."""
+    await agency_directory.changed()
+    try:
+        await agency_index.refresh_many(agency_ids)
+    except Exception as e:
+        print(f"⚠️ Agency index refresh failed for {len(agency_ids)} agencies, they stay as they were until their next write: {e}")
+
 class AgencyLogin(BaseModel):
     email: str
     password: str
@@ -59,6 +77,14 @@ class ResourceUpdate(BaseModel):
     current_mission: Optional[str] = None
     estimated_response_time: int
 
+class BulkAgencyUpdate(BaseModel):
+    agency_id: str
+    resources: Optional[ResourceUpdate] = None
+    status: Optional[str] = None
+
+class BulkUpdateRequest(BaseModel):
+    updates: List[BulkAgencyUpdate]
+
 class LiveLocationUpdate(BaseModel):
     latitude: float
     longitude: float
@@ -178,6 +204,8 @@ async def register_agency(agency: AgencyRegistration):
         }
         
         result = await agencies_collection.insert_one(agency_doc)
+        location_buffer.add_agency(str(result.inserted_id))
+        await agency_directory.changed()
         
         return {
             "success": True,
@@ -187,6 +215,65 @@ async def register_agency(agency: AgencyRegistration):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.put("/bulk")
+async def bulk_update_agencies(batch: BulkUpdateRequest):
+    """Resource and/or status changes for many agencies in one unordered bulk_write"""
+    if len(batch.updates) > AGENCY_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {AGENCY_BULK_MAX_ITEMS} updates per request")
+    try:
+        now = datetime.utcnow()
+        results = [None] * len(batch.updates)
+        operations, positions, seen = [], [], set()
+        for i, item in enumerate(batch.updates):
+            if not ObjectId.is_valid(item.agency_id):
+                results[i] = {"agency_id": item.agency_id, "result": "error", "detail": "Invalid agency ID"}
+            elif item.resources is None and item.status is None:
+                results[i] = {"agency_id": item.agency_id, "result": "error", "detail": "Nothing to update"}
+            elif item.agency_id in seen:
+                # Unordered writes to one document have no defined order
+                results[i] = {"agency_id": item.agency_id, "result": "error", "detail": "Agency appears more than once in the batch"}
+            else:
+                seen.add(item.agency_id)
+                update_data = {"last_updated": now}
+                if item.resources is not None:
+                    update_data["resources"] = item.resources.dict()
+                    update_data["response_time"] = item.resources.estimated_response_time
+                if item.status is not None:
+                    update_data["status"] = item.status
+                operations.append(UpdateOne({"_id": ObjectId(item.agency_id)}, {"$set": update_data}))
+                positions.append(i)
+
+        if operations:
+            # bulk_write only reports totals, so look up which agencies exist first
+            ids = [batch.updates[i].agency_id for i in positions]
+            existing = {str(doc["_id"]) for doc in await agencies_collection.find({"_id": {"$in": [ObjectId(a) for a in ids]}}, {"_id": 1}).to_list(None)}
+            failed = {}
+            try:
+                await agencies_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error.get("errmsg", "Write failed") for error in e.details.get("writeErrors", [])}
+            for n, i in enumerate(positions):
+                agency_id = batch.updates[i].agency_id
+                if n in failed:
+                    results[i] = {"agency_id": agency_id, "result": "error", "detail": failed[n]}
+                elif agency_id in existing:
+                    results[i] = {"agency_id": agency_id, "result": "updated"}
+                else:
+                    results[i] = {"agency_id": agency_id, "result": "not_found"}
+
+            # Dependent caches are refreshed once for the whole batch
+            updated = [r["agency_id"] for r in results if r["result"] == "updated"]
+            if updated:
+                await agencies_changed(updated)
+
+        return {
+            "success": True,
+            "updated": sum(r["result"] == "updated" for r in results),
+            "results": results
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/{agency_id}/resources")
 async def update_resources(agency_id: str, resources: ResourceUpdate):
     try:
@@ -208,6 +295,7 @@ async def update_resources(agency_id: str, resources: ResourceUpdate):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Agency not found")
+        await agencies_changed([agency_id])
         
         return {
             "success": True,
@@ -219,23 +307,58 @@ async def update_resources(agency_id: str, resources: ResourceUpdate):
 
 
 @router.get("/")
-async def get_all_agencies():
+async def get_all_agencies(
+    request: Request,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    district: Optional[str] = None,
+    city: Optional[str] = None,
+    specialization: Optional[str] = None,
+    availability: Optional[str] = Query(None, description="resources.availability"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    details: bool = Query(False, description="every field but the password, e.g. to review pending agencies")
+):
+    """Agency directory from the in-memory snapshot, list fields only.
+    Filters, a page size or details turn it into an indexed, keyset-paginated query."""
+    filters = {"status": status, "type": type, "district": district, "city": city, "specialization": specialization, "availability": availability}
+    if after and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if any(value is not None for value in filters.values()) or limit or after or details:
+        try:
+            agencies, next_cursor = await get_agencies(agencies_collection, limit or 100, after, filters, {"password": 0} if details else PUBLIC_PROJECTION)
+            def with_id(agency):
+                agency["id"] = str(agency.pop("_id"))
+                return agency
+            return json_stream_response({
+                "success": True,
+                "agencies": await JSONArrayStream(agencies, with_id).prime(),
+                "next_cursor": next_cursor
+            })
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
     try:
-        agencies = []
-        cursor = agencies_collection.find({})
-        
-        async for agency in cursor:
-            agency["id"] = str(agency["_id"])
-            del agency["_id"]
-            agencies.append(agency)
-        
-        return {
-            "success": True,
-            "agencies": agencies
-        }
+        body, etag = await agency_directory.snapshot()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/nearest")
+async def get_nearest_agencies(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    max_km: float | None = Query(None, gt=0)
+):
+    """Closest approved, available agencies with distance and estimated arrival time"""
+    return {
+        "success": True,
+        "agencies": agency_index.nearest(latitude, longitude, k, max_km)
+    }
+
 @router.get("/{agency_id}")
 async def get_agency(agency_id: str):
     try:
@@ -243,7 +366,7 @@ async def get_agency(agency_id: str):
         if not ObjectId.is_valid(agency_id):
             raise HTTPException(status_code=400, detail="Invalid agency ID")
         
-        agency = await agencies_collection.find_one({"_id": ObjectId(agency_id)})
+        agency = await agencies_collection.find_one({"_id": ObjectId(agency_id)}, {"password": 0})
         if not agency:
             raise HTTPException(status_code=404, detail="Agency not found")
         
@@ -272,6 +395,7 @@ async def update_agency_status(agency_id: str, status: str):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Agency not found")
+        await agencies_changed([agency_id])
         
         return {
             "success": True,
@@ -291,6 +415,9 @@ async def delete_agency(agency_id: str):
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Agency not found")
+        agency_index.remove(agency_id)
+        location_buffer.remove_agency(agency_id)
+        await agency_directory.changed()
         
         return {
             "success": True,
@@ -320,6 +447,7 @@ async def approve_agency(agency_id: str):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Agency not found")
+        await agencies_changed([agency_id])
         
         return {
             "success": True,
@@ -370,6 +498,7 @@ async def update_agency_details(agency_id: str, agency_update: AgencyUpdate):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Agency not found")
+        await agencies_changed([agency_id])
         
         return {
             "success": True,
@@ -387,38 +516,29 @@ async def update_live_location(agency_id: str, location_update: LiveLocationUpda
         if not ObjectId.is_valid(agency_id):
             raise HTTPException(status_code=400, detail="Invalid agency ID")
 
-        # Check if agency exists
-        existing_agency = await agencies_collection.find_one({"_id": ObjectId(agency_id)})
-        if not existing_agency:
+        # Existence comes from the in-memory id set, not a query per ping
+        if not await location_buffer.exists(agency_id):
             raise HTTPException(status_code=404, detail="Invalid agency ID")
 
-        # Prepare location update data
-        update_data = {
+        # Buffered: only the newest fix per agency is written, in the next bulk flush
+        fix = {
             "latitude": location_update.latitude,
             "longitude": location_update.longitude,
-            "last_updated": location_update.timestamp or datetime.utcnow(),
-            "location_accuracy": location_update.accuracy,
-            "location_speed": location_update.speed,
-            "location_heading": location_update.heading
+            "timestamp": location_update.timestamp,
+            "accuracy": location_update.accuracy,
+            "speed": location_update.speed,
+            "heading": location_update.heading
         }
-
-        # Update agency location
-        result = await agencies_collection.update_one(
-            {"_id": ObjectId(agency_id)},
-            {"$set": update_data}
-        )
-
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Agency not found")
+        accepted = location_buffer.accept(agency_id, fix)
 
         # Return updated location data
         return {
             "success": True,
-            "message": "Live location updated successfully",
+            "message": "Live location updated successfully" if accepted else "Older than the current location, ignored",
             "location": {
                 "latitude": location_update.latitude,
                 "longitude": location_update.longitude,
-                "timestamp": update_data["last_updated"],
+                "timestamp": fix["timestamp"],
                 "accuracy": location_update.accuracy,
                 "speed": location_update.speed,
                 "heading": location_update.heading
@@ -426,3 +546,27 @@ async def update_live_location(agency_id: str, location_update: LiveLocationUpda
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{agency_id}/trajectory")
+async def get_trajectory(
+    agency_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = Query(LOCATION_HISTORY_MAX_POINTS, ge=2, le=10000)
+):
+    """Location history of an agency, last hour by default, downsampled to max_points"""
+    if not ObjectId.is_valid(agency_id):
+        raise HTTPException(status_code=400, detail="Invalid agency ID")
+    if location_history.collection is None:
+        raise HTTPException(status_code=503, detail="Location history unavailable")
+    end = to_utc_naive(end) if end else datetime.utcnow()
+    start = to_utc_naive(start) if start else end - timedelta(hours=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        trajectory = await location_history.trajectory(
+            agency_id, start, end, max_points, pending=location_buffer.pending_history(agency_id)
+        )
+        return {"success": True, **trajectory}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Form
+import asyncio
+from fastapi import APIRouter, Form, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
 from datetime import datetime
 from backend.models import SOSAlert
-from backend.database import sos_alerts_collection, reports_collection
+from backend.database import sos_alerts_collection, reports_collection, committed_change_seq
 from bson import ObjectId
+from backend.geo import UTTARAKHAND_BOUNDS, UTTARAKHAND_CENTER, is_valid_coordinate, geojson_point, bbox_match, cluster_cell_size, MAP_MAX_LAT, nearest_district
+from backend.sos_stats import sos_stats
+from backend.sos_broadcast import sos_hub, SEVERITY_RANK
+from backend.sos_journal import sos_journal
+from backend.sos_dedup import sos_dedup
+from backend.agency_index import agency_index
+from backend.heatmap import heatmap
+from backend.json_stream import JSONArrayStream, json_stream_response
+from backend.config import SOS_STREAM_HEARTBEAT_SECONDS, SOS_NEAREST_AGENCIES
 
 router = APIRouter()
 
+RECENT_ALERTS = 5
+SYNC_MAX_LIMIT = 1000
+MAP_POINTS_MIN_ZOOM = 14
+MAP_MAX_POINTS = 1000
+MAP_MAX_CLUSTERS = 5000
+
 @router.post("/sos")
 async def sos_alert(
     reporter: str | None = Form(None),
@@ -40,77 +58,217 @@ async def sos_alert(
         "isSOSAlert": True,
         "timestamp": timestamp
     }
+    if is_valid_coordinate(latitude, longitude):
+        data["location"] = geojson_point(latitude, longitude)
+        data["district"] = nearest_district(latitude, longitude)
 
-    result = await sos_alerts_collection.insert_one(data)
+    incident, escalated = sos_dedup.observe(data)
+    if incident is not None:
+        # Repeat tap or a nearby duplicate: count it on the existing incident
+        update = {
+            "_id": str(incident["_id"]),
+            "latitude": incident["latitude"],
+            "longitude": incident["longitude"],
+            "severity": incident["severity"],
+            "hit_count": incident["hit_count"],
+            "last_seen": timestamp
+        }
+        if escalated:
+            await sos_journal.append_hit(incident["_id"], reporter, timestamp, severity, incident["previous_severity"])
+        else:
+            await sos_journal.append_hit(incident["_id"], reporter, timestamp)
+        sos_hub.publish(update, "sos_update")
+        return {
+            "message": "SOS alert received",
+            "id": update["_id"],
+            "duplicate": True,
+            "hit_count": update["hit_count"],
+            "data": update
+        }
+
+    if "location" in data:
+        data["nearest_agencies"] = agency_index.nearest(latitude, longitude, SOS_NEAREST_AGENCIES)
+
+    # Acknowledged once on local disk; reaches MongoDB in the next write-behind batch
+    alert_id = await sos_journal.append(data)
+    sos_stats.record(data)
+    heatmap.add("sos", latitude, longitude, data["_id"])
+    alert = {**data, "_id": alert_id}
+    sos_hub.publish(alert)
 
     return {
         "message": "SOS alert received",
-        "id": str(result.inserted_id),
-        "data": {**data, "_id": str(result.inserted_id)}
+        "id": alert_id,
+        "data": alert
     }
 
+@router.get("/sos/stream")
+async def stream_sos_alerts(
+    min_lat: float | None = Query(None, ge=-90, le=90),
+    min_lng: float | None = Query(None, ge=-180, le=180),
+    max_lat: float | None = Query(None, ge=-90, le=90),
+    max_lng: float | None = Query(None, ge=-180, le=180),
+    severity: str | None = Query(None, description="Comma-separated severities to receive"),
+    min_severity: str | None = Query(None, description="Receive this severity and above")
+):
+    """Server-Sent Events stream of new SOS alerts, optionally filtered by bounding box and severity"""
+    bounds = (min_lat, min_lng, max_lat, max_lng)
+    if any(v is not None for v in bounds) and any(v is None for v in bounds):
+        raise HTTPException(status_code=422, detail="Bounding box needs min_lat, min_lng, max_lat and max_lng")
+    if min_severity is not None and min_severity not in SEVERITY_RANK:
+        raise HTTPException(status_code=422, detail=f"min_severity must be one of {list(SEVERITY_RANK)}")
+    severities = {s.strip() for s in severity.split(",") if s.strip()} if severity else None
+    subscriber = sos_hub.subscribe(bbox=bounds if min_lat is not None else None, severities=severities, min_severity=min_severity)
+
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), SOS_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield b": ping\n\n"
+                    continue
+                if event is None:
+                    if subscriber.dropped:
+                        yield b"event: dropped\ndata: {}\n\n"
+                    break
+                yield event
+        finally:
+            sos_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/sos")
 async def get_sos_alerts():
     # Get SOS alerts from sos_alerts_collection (not reports_collection)
-    alerts_cursor = sos_alerts_collection.find({})
-    alerts = await alerts_cursor.to_list(length=None)
+    alerts = await JSONArrayStream(sos_alerts_collection.find({})).prime()
 
-    # Convert ObjectId to string for JSON serialization
+    # Written out as the cursor is read; the count is known once the last alert is out
+    return json_stream_response({"data": alerts, "count": lambda: alerts.count})
+
+@router.get("/sos/sync")
+async def sync_sos_alerts(
+    request: Request,
+    since: str | None = Query(None, description="next_cursor from the previous sync; a change_seq, or an alert id for new alerts only"),
+    limit: int = Query(500, ge=1, le=SYNC_MAX_LIMIT)
+):
+    """Alerts created or changed after the since cursor, oldest change first"""
+    if since is None or since.isdigit():
+        # Sequence cursor: every insert and every update takes the next change_seq. Stop below
+        # writes still in flight, or a later commit of a lower change_seq would be skipped
+        position = int(since or 0)
+        field, query = "change_seq", {"change_seq": {"$gt": position, "$lte": await committed_change_seq(sos_alerts_collection)}}
+    elif ObjectId.is_valid(since):
+        field, query = "_id", {"_id": {"$gt": ObjectId(since)}}
+    else:
+        raise HTTPException(status_code=422, detail="since must be a change_seq or an alert id")
+
+    alerts = await sos_alerts_collection.find(query).sort(field, 1).limit(limit + 1).to_list(limit + 1)
+    has_more = len(alerts) > limit
+    alerts = alerts[:limit]
+    next_cursor = str(alerts[-1][field]) if alerts else (since or "0")
     for alert in alerts:
         alert["_id"] = str(alert["_id"])
 
-    return {"count": len(alerts), "data": alerts}
+    # The cursor range pins the content: a changed alert would have a newer change_seq
+    headers = {"ETag": f'"sos-{since or 0}-{next_cursor}-{limit}"', "Cache-Control": "no-cache"}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(
+        jsonable_encoder({"alerts": alerts, "count": len(alerts), "next_cursor": next_cursor, "has_more": has_more}),
+        headers=headers
+    )
 
 @router.get("/sos-dashboard")
 async def get_sos_dashboard():
     """Get SOS dashboard data for government officials"""
+    # Served from the in-memory view once it has been seeded, no database round trip
+    if sos_stats.ready:
+        return sos_stats.dashboard(RECENT_ALERTS)
     try:
-        # Get all SOS alerts
-        alerts_cursor = sos_alerts_collection.find({})
-        alerts = await alerts_cursor.to_list(length=None)
-        
-        # Count by severity
-        critical_count = len([a for a in alerts if a.get("severity") == "critical"])
-        high_count = len([a for a in alerts if a.get("severity") == "high"])
-        medium_count = len([a for a in alerts if a.get("severity") == "medium"])
-        
-        # Get recent alerts (last 5)
-        recent_alerts = alerts[-5:] if alerts else []
-        
+        # Until sos_stats is seeded: separate queries that each stay on an index instead of
+        # one pipeline reading every alert. The total comes from collection metadata
+        severities = [s for s in await sos_alerts_collection.distinct("severity") if s is not None]
+        total, recent_alerts, *counts = await asyncio.gather(
+            sos_alerts_collection.estimated_document_count(),
+            sos_alerts_collection.find({}).sort("timestamp", -1).limit(RECENT_ALERTS).to_list(RECENT_ALERTS),
+            *(sos_alerts_collection.count_documents({"severity": severity}) for severity in severities)
+        )
+        alerts_by_severity = {"critical": 0, "high": 0, "medium": 0}
+        alerts_by_severity.update(zip(severities, counts))
+
         # Convert ObjectId to string for JSON serialization
         for alert in recent_alerts:
             alert["_id"] = str(alert["_id"])
-        
+
         return {
-            "total_alerts": len(alerts),
-            "active_alerts": len(alerts),  # All alerts are considered active
+            "total_alerts": total,
+            "active_alerts": total,  # All alerts are considered active
             "recent_alerts": recent_alerts,
-            "alerts_by_severity": {
-                "critical": critical_count,
-                "high": high_count,
-                "medium": medium_count
-            }
+            "alerts_by_severity": alerts_by_severity
         }
     except Exception as e:
         return {"error": f"Failed to get dashboard data: {str(e)}"}
 
 @router.get("/sos-map")
-async def get_sos_map():
-    """Get SOS alerts for map display"""
+async def get_sos_map(
+    min_lat: float = Query(UTTARAKHAND_BOUNDS[0], ge=-90, le=90),
+    min_lng: float = Query(UTTARAKHAND_BOUNDS[1], ge=-180, le=180),
+    max_lat: float = Query(UTTARAKHAND_BOUNDS[2], ge=-90, le=90),
+    max_lng: float = Query(UTTARAKHAND_BOUNDS[3], ge=-180, le=180),
+    zoom: int = Query(8, ge=0, le=22)
+):
+    """Get SOS alerts for map display, clustered for the requested viewport"""
+    if min_lat >= max_lat or min_lng >= max_lng:
+        raise HTTPException(status_code=422, detail="min_lat and min_lng must be below max_lat and max_lng")
+    min_lat, max_lat = max(min_lat, -MAP_MAX_LAT), min(max_lat, MAP_MAX_LAT)
+    if min_lat >= max_lat:
+        raise HTTPException(status_code=422, detail=f"Viewport is outside the map's ±{MAP_MAX_LAT}° latitude range")
     try:
-        alerts_cursor = sos_alerts_collection.find({})
-        alerts = await alerts_cursor.to_list(length=None)
-        
-        # Convert ObjectId to string for JSON serialization
-        for alert in alerts:
-            alert["_id"] = str(alert["_id"])
-        
-        return {
+        match = bbox_match(min_lat, min_lng, max_lat, max_lng)
+        cell = cluster_cell_size(zoom)
+        rank = {"$switch": {
+            "branches": [{"case": {"$eq": ["$severity", name]}, "then": value} for name, value in SEVERITY_RANK.items()],
+            "default": -1
+        }}
+        # Bucket alerts into a grid sized to the zoom level so the payload depends on the screen, not on history
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "x": {"$floor": {"$divide": [{"$arrayElemAt": ["$location.coordinates", 0]}, cell]}},
+                    "y": {"$floor": {"$divide": [{"$arrayElemAt": ["$location.coordinates", 1]}, cell]}}
+                },
+                "count": {"$sum": 1},
+                "lat": {"$avg": {"$arrayElemAt": ["$location.coordinates", 1]}},
+                "lng": {"$avg": {"$arrayElemAt": ["$location.coordinates", 0]}},
+                "severity_rank": {"$max": rank}
+            }},
+            {"$limit": MAP_MAX_CLUSTERS}
+        ]
+        severity_names = {value: name for name, value in SEVERITY_RANK.items()}
+        clusters = await JSONArrayStream(sos_alerts_collection.aggregate(pipeline), lambda group: {
+            "lat": group["lat"],
+            "lng": group["lng"],
+            "count": group["count"],
+            "severity": severity_names.get(group["severity_rank"])
+        }).prime()
+
+        # Individual alerts only once the map is zoomed in far enough to tell them apart
+        alerts = []
+        if zoom >= MAP_POINTS_MIN_ZOOM:
+            alerts = await JSONArrayStream(sos_alerts_collection.find(match).limit(MAP_MAX_POINTS)).prime()
+
+        return json_stream_response({
+            "clusters": clusters,
             "alerts": alerts,
-            "map_center": {"lat": 30.0668, "lng": 79.0193},  # Uttarakhand center
-            "zoom": 8
-        }
+            "cell_size": cell,
+            "bounds": {"min_lat": min_lat, "min_lng": min_lng, "max_lat": max_lat, "max_lng": max_lng},
+            "map_center": UTTARAKHAND_CENTER,
+            "zoom": zoom
+        })
     except Exception as e:
         return {"error": f"Failed to get map data: {str(e)}"}
 
@@ -0,0 +1,81 @@
+import json
+import asyncio
+from backend.config import SOS_STREAM_QUEUE_SIZE
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+class Subscriber:
+    """One connected client: a bounded queue of encoded events plus its filters."""
+
+    def __init__(self, queue_size: int, bbox: tuple | None = None, severities: set | None = None, min_severity: str | None = None):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.bbox = bbox
+        self.severities = severities
+        self.min_rank = SEVERITY_RANK.get(min_severity, -1)
+        self.dropped = False
+
+    def matches(self, alert: dict) -> bool:
+        severity = alert.get("severity")
+        if self.severities and severity not in self.severities:
+            return False
+        if SEVERITY_RANK.get(severity, -1) < self.min_rank:
+            return False
+        if self.bbox:
+            min_lat, min_lng, max_lat, max_lng = self.bbox
+            lat, lng = alert.get("latitude"), alert.get("longitude")
+            if lat is None or lng is None or not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                return False
+        return True
+
+class BroadcastHub:
+    """Fans new SOS alerts out to connected clients. Each alert is encoded once;
+    a client whose queue is full is disconnected rather than slowing the others."""
+
+    def __init__(self, queue_size: int = SOS_STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, **filters) -> Subscriber:
+        subscriber = Subscriber(self.queue_size, **filters)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, alert: dict, event_type: str = "sos"):
+        if not self.subscribers:
+            return
+        self.published += 1
+        event = f"id: {alert['_id']}\nevent: {event_type}\ndata: {json.dumps(alert, default=str)}\n\n".encode()
+        for subscriber in list(self.subscribers):
+            if not subscriber.matches(alert):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        # Empty the backlog so the client gets the drop notice right away
+        self.dropped += 1
+        subscriber.dropped = True
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def close(self):
+        """Wake every stream so it can end, e.g. on shutdown."""
+        for subscriber in list(self.subscribers):
+            self.unsubscribe(subscriber)
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self.subscribers), "published": self.published, "dropped": self.dropped}
+
+sos_hub = BroadcastHub()
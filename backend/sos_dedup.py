@@ -0,0 +1,143 @@
+import time
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from bson import ObjectId
+from backend.config import SOS_DEDUP_WINDOW_SECONDS, SOS_DEDUP_RADIUS_M, SOS_DEDUP_REPORTER_RADIUS_M
+from backend.geo import is_valid_coordinate, haversine_m
+from backend.sos_broadcast import SEVERITY_RANK
+
+METERS_PER_DEGREE = 111320
+# Placeholder reporter names that don't identify anyone; the SOS button sends "Anonymous" by default
+ANONYMOUS_REPORTERS = {"", "anonymous"}
+
+def identifies_reporter(reporter) -> bool:
+    return isinstance(reporter, str) and reporter.strip().lower() not in ANONYMOUS_REPORTERS
+
+class SOSDeduplicator:
+    """Collapses repeated SOS alerts into one incident.
+
+    An alert is a repeat of a live incident when it is within radius_m of it,
+    or within reporter_radius_m and from the same named reporter (repeated taps
+    with GPS jitter); anonymous alerts only match within radius_m. Incidents stay live for window_seconds after their last hit.
+    Incidents are bucketed in a grid of reporter_radius_m cells, so a lookup
+    only looks at the 3x3 cells around the alert."""
+
+    def __init__(self, window_seconds: float = SOS_DEDUP_WINDOW_SECONDS, radius_m: float = SOS_DEDUP_RADIUS_M,
+                 reporter_radius_m: float = SOS_DEDUP_REPORTER_RADIUS_M):
+        self.window = window_seconds
+        self.radius_m = radius_m
+        self.reporter_radius_m = max(reporter_radius_m, radius_m)
+        # Cells are square in degrees; sized for 60° latitude so a 3x3 block always covers the radius
+        self.cell_deg = self.reporter_radius_m / (METERS_PER_DEGREE * math.cos(math.radians(60)))
+        # Live incidents, least recently hit first
+        self.incidents = OrderedDict()
+        self.cells: dict[tuple, set] = {}
+        self.stats = {"incidents": 0, "duplicates": 0}
+
+    def _cell(self, latitude: float, longitude: float) -> tuple:
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    def _expire(self, now: float):
+        while self.incidents:
+            incident_id, incident = next(iter(self.incidents.items()))
+            if now - incident["seen_at"] <= self.window:
+                break
+            self.incidents.popitem(last=False)
+            cell = self.cells.get(incident["cell"])
+            if cell is not None:
+                cell.discard(incident_id)
+                if not cell:
+                    del self.cells[incident["cell"]]
+
+    def _find(self, alert: dict) -> dict | None:
+        latitude, longitude = alert["latitude"], alert["longitude"]
+        reporter = alert.get("reporter")
+        # Strangers sharing the default name must not merge across reporter_radius_m
+        reporter_radius_m = self.reporter_radius_m if identifies_reporter(reporter) else self.radius_m
+        x, y = self._cell(latitude, longitude)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for incident_id in self.cells.get((x + dx, y + dy), ()):
+                    incident = self.incidents[incident_id]
+                    if abs(incident["latitude"] - latitude) * METERS_PER_DEGREE > reporter_radius_m:
+                        continue
+                    distance = haversine_m(latitude, longitude, incident["latitude"], incident["longitude"])
+                    if distance <= self.radius_m or (distance <= reporter_radius_m and reporter in incident["reporters"]):
+                        return incident
+        return None
+
+    def _add(self, alert: dict, seen_at: float) -> dict:
+        cell = self._cell(alert["latitude"], alert["longitude"])
+        incident = {
+            "_id": alert["_id"],
+            "latitude": alert["latitude"],
+            "longitude": alert["longitude"],
+            "severity": alert.get("severity"),
+            "reporters": set(alert.get("reporters") or [alert.get("reporter")]),
+            "hit_count": alert.get("hit_count", 1),
+            "seen_at": seen_at,
+            "cell": cell
+        }
+        self.incidents[alert["_id"]] = incident
+        self.cells.setdefault(cell, set()).add(alert["_id"])
+        return incident
+
+    def observe(self, alert: dict) -> tuple[dict | None, bool]:
+        """Match the alert against live incidents and record it in one step, so
+        concurrent repeats can't both become new incidents.
+
+        Returns (incident, escalated) for a repeat, or (None, False) for a new
+        incident, in which case alert gets its _id and hit fields set. An
+        escalated incident keeps the severity it had in previous_severity."""
+        now = time.time()
+        self._expire(now)
+        alert.setdefault("_id", ObjectId())
+        if not is_valid_coordinate(alert.get("latitude"), alert.get("longitude")):
+            return None, False
+
+        incident = self._find(alert)
+        if incident is None:
+            alert["hit_count"] = 1
+            alert["reporters"] = [alert.get("reporter")]
+            alert["last_seen"] = alert.get("timestamp")
+            self._add(alert, now)
+            self.stats["incidents"] += 1
+            return None, False
+
+        incident["hit_count"] += 1
+        incident["reporters"].add(alert.get("reporter"))
+        incident["seen_at"] = now
+        self.incidents.move_to_end(incident["_id"])
+        escalated = SEVERITY_RANK.get(alert.get("severity"), -1) > SEVERITY_RANK.get(incident["severity"], -1)
+        if escalated:
+            incident["previous_severity"] = incident["severity"]
+            incident["severity"] = alert.get("severity")
+        self.stats["duplicates"] += 1
+        return incident, escalated
+
+    async def seed(self, collection, pending=()):
+        """Reload incidents still inside the window, from MongoDB and from
+        journaled alerts not written yet, so a restart doesn't split incidents."""
+        since = datetime.utcnow() - timedelta(seconds=self.window)
+        try:
+            recent = await collection.find(
+                {"_id": {"$gte": ObjectId.from_datetime(since)}, "location": {"$exists": True}},
+                {"latitude": 1, "longitude": 1, "severity": 1, "reporter": 1, "reporters": 1, "hit_count": 1}
+            ).to_list(None)
+        except Exception as e:
+            print(f"⚠️ MongoDB unavailable, SOS dedup starting empty: {e}")
+            recent = []
+        pending = [doc for doc in pending if "_op" not in doc and "_id" in doc]
+        seeded = {doc["_id"]: doc for doc in recent + pending}
+        now = time.time()
+        for doc in sorted(seeded.values(), key=lambda d: d["_id"]):
+            if doc["_id"] not in self.incidents and is_valid_coordinate(doc.get("latitude"), doc.get("longitude")):
+                # Expire by the alert's age as far as we can tell it
+                self._add(doc, min(now, doc["_id"].generation_time.timestamp()))
+        print(f"✅ SOS dedup seeded with {len(self.incidents)} live incidents")
+
+    def status(self) -> dict:
+        return {**self.stats, "live_incidents": len(self.incidents)}
+
+sos_dedup = SOSDeduplicator()
@@ -0,0 +1,305 @@
+import os
+import fcntl
+import asyncio
+from collections import deque
+from pathlib import Path
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from backend.database import sos_alerts_collection, change_seq_lease
+from backend.config import SOS_JOURNAL_PATH, SOS_JOURNAL_COMMIT_MS, SOS_FLUSH_INTERVAL_MS, SOS_FLUSH_BATCH_SIZE, SOS_FLUSH_RETRY_SECONDS
+
+DUPLICATE_KEY = 11000
+
+class SOSJournal:
+    """Durable write-behind ingestion for SOS alerts.
+
+    append() gives the alert a client-side ObjectId, writes it to an
+    append-only journal file and returns once it is fsynced; concurrent
+    appends share one write + fsync (group commit). A background task then
+    moves journaled alerts into MongoDB with insert_many. After a restart or
+    an outage the journal is replayed; the client-side _id makes replays
+    idempotent. The file is truncated whenever everything in it is in MongoDB.
+
+    Each worker process journals to its own file next to path, suffixed with
+    its pid and held under an exclusive flock while it runs. At start a worker
+    adopts the files whose lock it can take, i.e. those of dead processes:
+    their entries are copied into its own file and replayed from there.
+
+    Repeat alerts are journaled as "hit" entries and applied to their
+    incident after each batch of inserts. Hit counts are at-least-once: a
+    crash in the middle of a flush can count some hits twice on replay.
+    Every inserted or updated alert gets a new change_seq for delta sync,
+    reserved once per batch and held as in flight until the batch is written."""
+
+    def __init__(self, path=SOS_JOURNAL_PATH, commit_ms: float = SOS_JOURNAL_COMMIT_MS, flush_interval_ms: float = SOS_FLUSH_INTERVAL_MS,
+                 flush_batch_size: int = SOS_FLUSH_BATCH_SIZE, retry_seconds: float = SOS_FLUSH_RETRY_SECONDS):
+        self.path = Path(path)
+        self.file_path = None
+        self.commit_wait = commit_ms / 1000
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_batch_size = flush_batch_size
+        self.retry_seconds = retry_seconds
+        self.collection = sos_alerts_collection
+        # Journaled but not yet in MongoDB, oldest first
+        self.backlog = deque()
+        self.stats = {"appended": 0, "commits": 0, "flushed": 0, "replayed": 0, "flush_errors": 0}
+        self._pending: asyncio.Queue | None = None
+        self._file = None
+        self._file_lock: asyncio.Lock | None = None
+        self._backlog_ready: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._outage = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, collection=sos_alerts_collection):
+        if self.running:
+            return
+        self.collection = collection
+        self._pending = asyncio.Queue()
+        self._file_lock = asyncio.Lock()
+        self._backlog_ready = asyncio.Event()
+        await asyncio.to_thread(self.path.parent.mkdir, parents=True, exist_ok=True)
+        self.file_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}{self.path.suffix}")
+        replayed = await asyncio.to_thread(self._open_journal)
+        self.backlog.extend(replayed)
+        self.stats["replayed"] += len(replayed)
+        if replayed:
+            print(f"↩️ Replaying {len(replayed)} journaled SOS alerts")
+            self._backlog_ready.set()
+        self._tasks = [asyncio.create_task(self._write_loop()), asyncio.create_task(self._flush_loop())]
+
+    async def stop(self):
+        if not self.running:
+            return
+        # Let queued appends reach the disk, then try one last flush
+        while not self._pending.empty():
+            await asyncio.sleep(self.commit_wait or 0.001)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.backlog:
+            try:
+                await asyncio.wait_for(self._flush_once(), timeout=5)
+            except Exception as e:
+                print(f"⚠️ {len(self.backlog)} SOS alerts left in journal for next start: {e}")
+        if not self.backlog:
+            # Nothing left to replay; unlinked under the lock so no one adopts it meanwhile
+            await asyncio.to_thread(self.file_path.unlink, missing_ok=True)
+        await asyncio.to_thread(self._file.close)
+        self._file = None
+
+    async def append(self, doc: dict) -> str:
+        """Journal one alert durably and queue it for MongoDB. Returns its id."""
+        doc.setdefault("_id", ObjectId())
+        if not self.running:
+            # Scripts and tests without the lifespan: write straight through
+            await self._insert_direct(doc)
+            return str(doc["_id"])
+        try:
+            await self._commit(doc)
+        except OSError as e:
+            # Journal disk failing: better a synchronous insert than a lost alert
+            print(f"⚠️ SOS journal write failed, inserting directly: {e}")
+            await self._insert_direct(doc)
+        return str(doc["_id"])
+
+    async def append_hit(self, incident_id, reporter: str | None, timestamp: str | None, severity: str | None = None, previous_severity: str | None = None):
+        """Journal a repeat of an existing incident; severity, and the one it replaces, only when it escalates."""
+        hit = {"_op": "hit", "incident": incident_id, "reporter": reporter, "timestamp": timestamp, "severity": severity, "previous_severity": previous_severity}
+        if not self.running:
+            await self._hit_direct(hit)
+            return
+        try:
+            await self._commit(hit)
+        except OSError as e:
+            print(f"⚠️ SOS journal write failed, updating directly: {e}")
+            await self._hit_direct(hit)
+
+    async def _insert_direct(self, doc: dict):
+        async with change_seq_lease(self.collection) as seq:
+            doc["change_seq"] = seq
+            await self.collection.insert_one(doc)
+
+    async def _hit_direct(self, hit: dict):
+        merged = self._merge_hits([hit])
+        async with change_seq_lease(self.collection) as seq:
+            await self.collection.bulk_write(self._hit_updates(merged, seq))
+
+    async def _commit(self, entry: dict):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((entry, future))
+        await future
+
+    def _open_journal(self) -> list[dict]:
+        """Open and lock this process's journal and adopt orphaned ones.
+        Returns the entries to replay, all of them now in this process's file."""
+        self._file = open(self.file_path, "ab+")
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Left over by an earlier process with the same pid
+        self._file.seek(0)
+        entries = self._read_entries(self._file)
+        # The unsuffixed path is the shared journal of earlier versions
+        for path in [self.path, *sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"))]:
+            if path != self.file_path:
+                entries += self._adopt(path)
+        return entries
+
+    def _adopt(self, path: Path) -> list[dict]:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Its worker is alive and replays it itself
+                return []
+            try:
+                current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if not current:
+                # Adopted and removed by another worker between our open and lock
+                return []
+            entries = self._read_entries(f)
+            if entries:
+                self._write_and_sync(b"".join(json_util.dumps(entry).encode() + b"\n" for entry in entries))
+            os.unlink(path)
+        print(f"↩️ Adopted SOS journal {path.name} ({len(entries)} entries)")
+        return entries
+
+    @staticmethod
+    def _read_entries(f) -> list[dict]:
+        entries = []
+        for line in f:
+            try:
+                entries.append(json_util.loads(line))
+            except ValueError:
+                # Torn line from a crash or failed write mid-line; it was never acknowledged
+                continue
+        return entries
+
+    def _write_and_sync(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._pending.get()]
+            if self.commit_wait:
+                await asyncio.sleep(self.commit_wait)
+            while not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            data = b"".join(json_util.dumps(entry).encode() + b"\n" for entry, _ in batch)
+            try:
+                async with self._file_lock:
+                    await asyncio.to_thread(self._write_and_sync, data)
+                    self.backlog.extend(entry for entry, _ in batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["commits"] += 1
+            self.stats["appended"] += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            self._backlog_ready.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._backlog_ready.wait()
+            self._backlog_ready.clear()
+            # Give a burst a moment to accumulate into one insert_many
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush_once()
+                if self._outage:
+                    print("✅ MongoDB back, SOS journal drained")
+                    self._outage = False
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                if not self._outage:
+                    print(f"⚠️ MongoDB unavailable, keeping {len(self.backlog)} SOS alerts in journal: {e}")
+                    self._outage = True
+                await asyncio.sleep(self.retry_seconds)
+                self._backlog_ready.set()
+
+    @staticmethod
+    def _merge_hits(hits: list[dict]) -> dict:
+        # One update per incident however many times it was hit in the batch
+        merged = {}
+        for hit in hits:
+            update = merged.setdefault(hit["incident"], {"count": 0, "reporters": [], "last_seen": None, "severity": None, "previous_severity": None})
+            update["count"] += 1
+            if hit["reporter"] not in update["reporters"]:
+                update["reporters"].append(hit["reporter"])
+            if hit["timestamp"] and (update["last_seen"] is None or hit["timestamp"] > update["last_seen"]):
+                update["last_seen"] = hit["timestamp"]
+            if hit["severity"]:
+                # Several escalations in one batch count as one, from the first severity to the last
+                if not update["severity"]:
+                    update["previous_severity"] = hit.get("previous_severity")
+                update["severity"] = hit["severity"]
+        return merged
+
+    @staticmethod
+    def _hit_updates(merged: dict, first_seq: int) -> list[UpdateOne]:
+        requests = []
+        for i, (incident_id, update) in enumerate(merged.items()):
+            change = {
+                "$inc": {"hit_count": update["count"]},
+                "$addToSet": {"reporters": {"$each": update["reporters"]}},
+                "$set": {"change_seq": first_seq + i}
+            }
+            if update["last_seen"]:
+                change["$max"] = {"last_seen": update["last_seen"]}
+            if update["severity"]:
+                change["$set"]["severity"] = update["severity"]
+                # Unique per escalation, so change stream consumers always see it and can move the count
+                change["$set"]["escalation"] = {"from": update["previous_severity"], "seq": first_seq + i}
+            requests.append(UpdateOne({"_id": incident_id}, change))
+        return requests
+
+    async def _flush_once(self):
+        while self.backlog:
+            batch = [self.backlog[i] for i in range(min(self.flush_batch_size, len(self.backlog)))]
+            inserts = [entry for entry in batch if "_op" not in entry]
+            hits = self._merge_hits([entry for entry in batch if entry.get("_op") == "hit"])
+            async with change_seq_lease(self.collection, len(inserts) + len(hits)) as first_seq:
+                for i, doc in enumerate(inserts):
+                    doc["change_seq"] = first_seq + i
+                if inserts:
+                    try:
+                        await self.collection.insert_many(inserts, ordered=False)
+                    except BulkWriteError as e:
+                        # Already inserted by an earlier, interrupted flush or replay
+                        if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                            raise
+                # After the inserts, so hits on incidents from this same batch find their document
+                if hits:
+                    await self.collection.bulk_write(self._hit_updates(hits, first_seq + len(inserts)), ordered=False)
+            # Only drop what was written; appends during the await sit behind it
+            for _ in batch:
+                self.backlog.popleft()
+            self.stats["flushed"] += len(batch)
+        await self._truncate_if_drained()
+
+    async def _truncate_if_drained(self):
+        async with self._file_lock:
+            # Everything in this process's file is in MongoDB; the lock keeps the writer out meanwhile
+            if not self.backlog:
+                await asyncio.to_thread(self._file.truncate, 0)
+
+    def status(self) -> dict:
+        return {**self.stats, "backlog": len(self.backlog), "outage": self._outage}
+
+sos_journal = SOSJournal()
@@ -0,0 +1,157 @@
+import asyncio
+from collections import Counter, deque
+from datetime import datetime
+from backend.config import SOS_STATS_RECENT_SIZE, SOS_STATS_RESYNC_SECONDS
+from backend.geo import nearest_district
+
+class SOSStats:
+    """In-process materialized view of the sos_alerts collection: totals,
+    per-severity and per-district counts and the most recent alerts.
+
+    Seeded from MongoDB at startup, updated in place on every insert, and
+    reconciled from a change stream of inserts and severity escalations
+    (replica sets) or by periodic resync."""
+
+    def __init__(self, recent_size: int = SOS_STATS_RECENT_SIZE, resync_seconds: float = SOS_STATS_RESYNC_SECONDS):
+        self.recent_size = recent_size
+        self.resync_seconds = resync_seconds
+        self.total = 0
+        self.by_severity = Counter()
+        self.by_district = Counter()
+        self.recent = deque(maxlen=recent_size)
+        # Alerts this process counted whose insert the change stream hasn't delivered yet. Each id
+        # leaves on its echo, so the set is bounded by the write-behind backlog plus stream lag
+        self._local: set[str] = set()
+        self.ready = False
+        self.mode = "starting"
+        self.last_synced = None
+        self._task = None
+
+    def record(self, alert: dict):
+        """Count an alert this process journaled; its change stream event is skipped."""
+        alert_id = str(alert.get("_id"))
+        self._local.add(alert_id)
+        self._count(alert, alert_id)
+
+    def _on_insert(self, alert: dict):
+        alert_id = str(alert.get("_id"))
+        if alert_id in self._local:
+            self._local.discard(alert_id)
+            return
+        self._count(alert, alert_id)
+
+    def _on_escalation(self, alert_id: str, fields: dict):
+        """Move an escalated alert between severities; every worker does this from the stream."""
+        self.by_severity[fields["escalation"].get("from")] -= 1
+        self.by_severity[fields["severity"]] += 1
+        for alert in self.recent:
+            if alert["_id"] == alert_id:
+                alert["severity"] = fields["severity"]
+
+    def _count(self, alert: dict, alert_id: str):
+        self.total += 1
+        self.by_severity[alert.get("severity")] += 1
+        district = alert.get("district") or nearest_district(alert.get("latitude"), alert.get("longitude"))
+        if district:
+            self.by_district[district] += 1
+        self.recent.appendleft({**alert, "_id": alert_id})
+
+    def dashboard(self, recent: int) -> dict:
+        alerts_by_severity = {"critical": 0, "high": 0, "medium": 0}
+        alerts_by_severity.update({k: v for k, v in self.by_severity.items() if k is not None})
+        return {
+            "total_alerts": self.total,
+            "active_alerts": self.total,  # All alerts are considered active
+            "recent_alerts": list(self.recent)[:recent],
+            "alerts_by_severity": alerts_by_severity,
+            "alerts_by_district": dict(self.by_district.most_common()),
+            "stats": {"mode": self.mode, "last_synced": self.last_synced}
+        }
+
+    async def seed(self, collection, session=None):
+        """Rebuild every counter from MongoDB. With a snapshot session all
+        reads see the collection at one cluster time."""
+        total = await collection.count_documents({}, session=session)
+        by_severity = Counter()
+        async for group in collection.aggregate([{"$group": {"_id": "$severity", "count": {"$sum": 1}}}], session=session):
+            by_severity[group["_id"]] = group["count"]
+        by_district = Counter()
+        # Separate cursors rather than one $facet document, which is capped at 16MB
+        async for group in collection.aggregate([
+            {"$match": {"district": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$district", "count": {"$sum": 1}}}
+        ], session=session):
+            by_district[group["_id"]] += group["count"]
+        # Older alerts have no district field; group them by ~1km cell and attribute here
+        async for group in collection.aggregate([
+            {"$match": {"district": {"$in": [None, ""]}}},
+            {"$group": {"_id": {"lat": {"$round": ["$latitude", 2]}, "lng": {"$round": ["$longitude", 2]}}, "count": {"$sum": 1}}}
+        ], session=session):
+            district = nearest_district(group["_id"].get("lat"), group["_id"].get("lng"))
+            if district:
+                by_district[district] += group["count"]
+        recent = await collection.find({}, session=session).sort("timestamp", -1).limit(self.recent_size).to_list(self.recent_size)
+
+        self.total = total
+        self.by_severity = by_severity
+        self.by_district = by_district
+        self.recent = deque(({**a, "_id": str(a["_id"])} for a in recent), maxlen=self.recent_size)
+        # The counts above replace anything recorded locally so far, echoed or not
+        self._local = set()
+        self.last_synced = datetime.utcnow().isoformat()
+        self.ready = True
+
+    async def _follow(self, collection):
+        """Seed from a snapshot, then apply every change after it from the
+        change stream (replica sets only), so nothing between the two is lost
+        or counted twice."""
+        async with await collection.database.client.start_session(snapshot=True) as session:
+            await self.seed(collection, session)
+            seeded_at = session.operation_time
+        pipeline = [{"$match": {"$or": [
+            {"operationType": "insert"},
+            {"operationType": "update", "updateDescription.updatedFields.escalation": {"$exists": True}}
+        ]}}]
+        async with collection.watch(pipeline, start_at_operation_time=seeded_at) as stream:
+            self.mode = "change_stream"
+            print("✅ SOS stats following change stream")
+            async for change in stream:
+                # The stream starts at the snapshot time inclusive; the snapshot already has those
+                if change["clusterTime"] <= seeded_at:
+                    continue
+                if change["operationType"] == "insert":
+                    self._on_insert(change["fullDocument"])
+                else:
+                    self._on_escalation(str(change["documentKey"]["_id"]), change["updateDescription"]["updatedFields"])
+
+    async def _run(self, collection):
+        while True:
+            try:
+                await self._follow(collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Standalone servers have neither snapshot reads nor change streams; a dropped connection lands here too
+                if self.mode != "resync":
+                    print(f"⚠️ SOS stats falling back to periodic resync every {self.resync_seconds:g}s: {e}")
+                self.mode = "resync"
+                try:
+                    await self.seed(collection)
+                except Exception as e:
+                    print(f"⚠️ SOS stats resync failed: {e}")
+            await asyncio.sleep(self.resync_seconds)
+
+    def start(self, collection):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(collection))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+sos_stats = SOSStats()
@@ -0,0 +1,81 @@
+"""Explain-plan check for the rescue agency listing filters.
+
+Creates the agency indexes in a scratch database, then explains the queries
+GET /rescue-agencies/ runs for every combination of filters, with and
+without a page cursor, and fails if any winning plan is a collection scan.
+Skipped when no MongoDB answers at TEST_MONGODB_URI.
+"""
+import os
+import asyncio
+from itertools import combinations
+import pytest
+import motor.motor_asyncio
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from backend.database import AGENCY_FILTER_FIELDS, ensure_agency_indexes, agency_query
+
+MONGODB_URI = os.getenv("TEST_MONGODB_URI", "mongodb://localhost:27017")
+
+SAMPLE_VALUES = {
+    "status": "Approved",
+    "type": "Fire Department",
+    "district": "Dehradun",
+    "city": "Dehradun",
+    "specialization": "Flood Rescue",
+    "availability": "Available"
+}
+
+def plan_stages(plan) -> set[str]:
+    """Every stage name in an explain document, classic or slot-based engine."""
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= plan_stages(item)
+    return stages
+
+async def collection_scans(collection) -> list[str]:
+    await ensure_agency_indexes(collection)
+    failures = []
+    names = list(AGENCY_FILTER_FIELDS)
+    for size in range(len(names) + 1):
+        for combo in combinations(names, size):
+            filters = {name: SAMPLE_VALUES[name] for name in combo}
+            for after in (None, str(ObjectId())):
+                query = agency_query(filters, after)
+                # The boundary peek and the page query get_agencies runs
+                for label, cursor in (
+                    ("peek", collection.find(query, {"_id": 1}).sort("_id", 1).skip(99).limit(2)),
+                    ("page", collection.find(query).sort("_id", 1).limit(100))
+                ):
+                    explain = await cursor.explain()
+                    if "COLLSCAN" in plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})):
+                        failures.append(f"{label} {'+'.join(combo) or 'no filters'}{' after cursor' if after else ''}")
+    return failures
+
+async def check_scratch_database() -> list[str]:
+    client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        try:
+            await client.admin.command("ping")
+        except PyMongoError as e:
+            pytest.skip(f"No MongoDB at {MONGODB_URI}: {e}")
+        db = client[f"test_agency_indexes_{ObjectId()}"]
+        try:
+            return await collection_scans(db.rescue_agencies)
+        finally:
+            await client.drop_database(db.name)
+    finally:
+        client.close()
+
+def test_plan_stages_walks_nested_plans():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}}
+    assert plan_stages(plan) == {"FETCH", "OR", "IXSCAN", "COLLSCAN"}
+
+def test_agency_listing_queries_use_an_index():
+    failures = asyncio.run(check_scratch_database())
+    assert not failures, f"{len(failures)} queries use a collection scan: {failures}"
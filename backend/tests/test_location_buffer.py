@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from backend.location_buffer import LocationBuffer, to_utc_naive
+
+AGENCY = str(ObjectId())
+
+def fix(timestamp, latitude=30.3, longitude=78.0):
+    return {"latitude": latitude, "longitude": longitude, "timestamp": timestamp}
+
+def test_accepts_newer_and_drops_older_fixes():
+    buffer = LocationBuffer()
+    now = datetime.utcnow()
+    assert buffer.accept(AGENCY, fix(now - timedelta(seconds=10)))
+    assert buffer.accept(AGENCY, fix(now, latitude=30.4))
+    assert not buffer.accept(AGENCY, fix(now - timedelta(seconds=5), latitude=30.5))
+    assert buffer.latest[AGENCY]["latitude"] == 30.4
+    assert buffer.dirty == {AGENCY}
+    assert len(buffer.history[AGENCY]) == 2
+    assert buffer.stats["accepted"] == 2 and buffer.stats["stale"] == 1
+
+def test_missing_timestamp_gets_server_time():
+    buffer = LocationBuffer()
+    before = datetime.utcnow()
+    assert buffer.accept(AGENCY, fix(None))
+    assert before <= buffer.latest[AGENCY]["timestamp"] <= datetime.utcnow()
+
+def test_aware_timestamps_are_stored_as_naive_utc():
+    aware = datetime(2024, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    assert to_utc_naive(aware) == datetime(2024, 1, 1, 6, 30)
+    buffer = LocationBuffer()
+    buffer.accept(AGENCY, fix(aware))
+    assert buffer.latest[AGENCY]["timestamp"].tzinfo is None
+
+def test_future_fix_is_clamped_and_does_not_pin_the_position():
+    buffer = LocationBuffer(max_clock_skew_seconds=30)
+    assert buffer.accept(AGENCY, fix(datetime.utcnow() + timedelta(days=1)))
+    assert buffer.latest[AGENCY]["timestamp"] <= datetime.utcnow()
+    assert buffer.stats["clamped"] == 1
+    # A correct fix right after still moves the agency
+    assert buffer.accept(AGENCY, fix(datetime.utcnow(), latitude=30.6))
+    assert buffer.latest[AGENCY]["latitude"] == 30.6
+
+def test_fix_within_the_skew_keeps_its_timestamp():
+    buffer = LocationBuffer(max_clock_skew_seconds=30)
+    ahead = datetime.utcnow() + timedelta(seconds=10)
+    buffer.accept(AGENCY, fix(ahead))
+    assert buffer.latest[AGENCY]["timestamp"] == ahead
+    assert buffer.stats["clamped"] == 0
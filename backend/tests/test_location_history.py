@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from backend.location_history import (
+    FIELDS, NO_SPEED, LocationHistory, bucket_points, downsample, encode_fix, epoch_ms, hour_of, pack, unpack
+)
+
+HOUR = datetime(2024, 7, 1, 10)
+
+def track(count: int) -> np.ndarray:
+    """A vehicle moving steadily north-east, one fix every 5s, speed unknown on every tenth."""
+    fixes = [
+        encode_fix(HOUR, HOUR + timedelta(seconds=5 * i), 30.3 + i * 1e-4, 78.0 + i * 5e-5, None if i % 10 == 0 else 8.5)
+        for i in range(count)
+    ]
+    return np.array(fixes, dtype=np.int64).T
+
+def test_encode_fix_scales_to_ints():
+    assert encode_fix(HOUR, HOUR + timedelta(seconds=1.5), 30.123456, -78.5, 2.25) == (1500, 30123456, -78500000, 225)
+    assert encode_fix(HOUR, HOUR, 0, 0, None)[3] == NO_SPEED
+
+def test_epoch_ms_and_hour_of_use_naive_utc():
+    assert epoch_ms(datetime(1970, 1, 1, 0, 0, 1)) == 1000
+    assert hour_of(datetime(2024, 7, 1, 10, 59, 59, 999999)) == HOUR
+
+def test_pack_round_trips():
+    points = track(720)
+    packed = pack(points)
+    assert np.array_equal(unpack(packed), points)
+    # Delta encoding keeps a steady track to a few bytes per point
+    assert len(packed) < points.shape[1] * 4
+
+def test_pack_round_trips_empty_and_negative():
+    empty = np.empty((len(FIELDS), 0), dtype=np.int64)
+    assert unpack(pack(empty)).shape == (len(FIELDS), 0)
+    points = np.array([[0, 10], [-33868800, -33868900], [-151209300, -151209200], [NO_SPEED, 0]], dtype=np.int64)
+    assert np.array_equal(unpack(pack(points)), points)
+
+def test_bucket_points_merges_packed_and_pending_and_drops_repeats():
+    points = track(20)
+    doc = {
+        "packed": pack(points[:, :12]),
+        # A retried flush pushed fixes 10 and 11 again
+        **{field: points[row, 10:].tolist() for row, field in enumerate(FIELDS)}
+    }
+    assert np.array_equal(bucket_points(doc), points)
+
+def test_bucket_points_sorts_by_time():
+    points = track(5)
+    doc = {field: points[row, ::-1].tolist() for row, field in enumerate(FIELDS)}
+    assert np.array_equal(bucket_points(doc), points)
+
+def test_bucket_points_of_an_empty_bucket():
+    assert bucket_points({}).shape == (len(FIELDS), 0)
+
+def test_downsample_keeps_ends_and_budget():
+    assert np.array_equal(downsample(5, 10), np.arange(5))
+    picked = downsample(1000, 50)
+    assert len(picked) == 50
+    assert picked[0] == 0 and picked[-1] == 999
+    assert np.all(np.diff(picked) > 0)
+
+def test_updates_push_one_upsert_per_hour():
+    agency_id = str(ObjectId())
+    fixes = [
+        {"timestamp": HOUR + timedelta(minutes=59), "latitude": 30.3, "longitude": 78.0},
+        {"timestamp": HOUR + timedelta(minutes=61), "latitude": 30.4, "longitude": 78.1, "speed": 3.0},
+        {"timestamp": HOUR + timedelta(minutes=62), "latitude": 30.5, "longitude": 78.2}
+    ]
+    requests = LocationHistory().updates(agency_id, fixes)
+    assert [request._filter["hour"] for request in requests] == [HOUR, HOUR + timedelta(hours=1)]
+    later = requests[1]._doc
+    assert later["$inc"] == {"n": 2}
+    assert later["$push"]["t"] == {"$each": [60_000, 120_000]}
+    assert later["$push"]["spd"] == {"$each": [300, NO_SPEED]}
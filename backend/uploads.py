@@ -0,0 +1,64 @@
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+from backend.config import MAX_REQUEST_SIZE
+
+def validate_upload_type(upload: UploadFile, allowed_types: list[str]) -> str:
+    # Browsers send parameters too, e.g. "audio/webm;codecs=opus"
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    if content_type not in allowed_types:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type '{content_type}' for {upload.filename}")
+    return content_type
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, max_size: int):
+        super().__init__(status_code=413, detail=f"Request exceeds {max_size // (1024 * 1024)}MB limit")
+
+class UploadSizeLimitMiddleware:
+    """Rejects multipart requests larger than MAX_REQUEST_SIZE before the form
+    is parsed: up front from Content-Length, or as soon as the streamed body
+    passes the limit."""
+
+    def __init__(self, app, max_size: int = MAX_REQUEST_SIZE):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+            return await self.reject(scope, receive, send)
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    raise RequestTooLarge(self.max_size)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            if response_started:
+                raise
+            await self.reject(scope, receive, send)
+
+    async def reject(self, scope, receive, send):
+        error = RequestTooLarge(self.max_size)
+        response = JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers={"Connection": "close"})
+        await response(scope, receive, send)
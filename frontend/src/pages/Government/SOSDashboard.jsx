@@ -62,13 +62,32 @@ export default function GovtDashboard() {
   const [agencies, setAgencies] = useState([]);
   const [agenciesLoading, setAgenciesLoading] = useState(false);
 
+  const fetchAgencyDetails = async (agency) => {
+    try {
+      const response = await fetch(`${BASE_URL}/rescue-agencies/${agency.id}`);
+      if (response.ok) {
+        const result = await response.json();
+        return { ...agency, ...result.agency };
+      }
+    } catch (error) {
+      console.error('Error fetching agency details:', error);
+    }
+    return agency;
+  };
+
   const fetchAgencies = async () => {
     setAgenciesLoading(true);
     try {
-      const response = await fetch(`${BASE_URL}/rescue-agencies/`);
+      // The list leaves out contact and licence details; pending approvals need them for review
+      const [response, pendingResponse] = await Promise.all([
+        fetch(`${BASE_URL}/rescue-agencies/`),
+        fetch(`${BASE_URL}/rescue-agencies/?status=Pending&details=true&limit=500`)
+      ]);
       if (response.ok) {
         const result = await response.json();
-        setAgencies(result.agencies || []);
+        const pending = pendingResponse.ok ? (await pendingResponse.json()).agencies || [] : [];
+        const details = new Map(pending.map(agency => [agency.id, agency]));
+        setAgencies((result.agencies || []).map(agency => ({ ...agency, ...details.get(agency.id) })));
       } else {
         console.error('Failed to fetch agencies');
         setAgencies([]);
@@ -136,7 +155,8 @@ export default function GovtDashboard() {
     setSelectedAgency(null);
   };
 
-  const handleUpdateAgency = (agency) => {
+  const handleUpdateAgency = async (listed) => {
+    const agency = await fetchAgencyDetails(listed);
     setAgencyToUpdate(agency);
     setUpdateForm({
       name: agency.name || '',
@@ -229,8 +249,8 @@ export default function GovtDashboard() {
     }
   };
 
-  const handleViewAgencyDetails = (agency) => {
-    setSelectedAgency(agency);
+  const handleViewAgencyDetails = async (agency) => {
+    setSelectedAgency(await fetchAgencyDetails(agency));
     setShowAgencyModal(true);
   };
 
@@ -706,7 +726,6 @@ export default function GovtDashboard() {
                 <th>TYPE</th>
                 <th>LOCATION</th>
                 <th>CONTACT PERSON</th>
-                <th>CONTACT NUMBER</th>
                 <th>STATUS</th>
                 <th>RESOURCES</th>
                 <th>RESPONSE TIME</th>
@@ -717,13 +736,13 @@ export default function GovtDashboard() {
             <tbody>
               {agenciesLoading ? (
                 <tr>
-                  <td colSpan="10" className="center">
+                  <td colSpan="9" className="center">
                     <div className="loading-indicator">Loading agencies...</div>
                   </td>
                 </tr>
               ) : agencies.length === 0 ? (
                 <tr>
-                  <td colSpan="10" className="center">
+                  <td colSpan="9" className="center">
                     <div className="govt-no-data">
                       <p className="govt-no-data-title">NO AGENCIES REGISTERED</p>
                       <p className="govt-no-data-subtitle">
@@ -747,9 +766,6 @@ export default function GovtDashboard() {
                     <td>
                       <div><strong>{agency.contactPerson}</strong></div>
                     </td>
-                    <td>
-                      <div><strong>{agency.contactNumber}</strong></div>
-                    </td>
                     <td>
                       <span className={`status-badge status-${agency.resources?.availability?.toLowerCase() || 'unknown'}`}>
                         {agency.resources?.availability || 'UNKNOWN'}
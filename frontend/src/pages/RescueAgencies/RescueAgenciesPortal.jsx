@@ -356,12 +356,14 @@ const RescueAgenciesPortal = () => {
   };
 
   // Function to open update modal for an agency
-  const openUpdateModal = (agency) => {
+  const openUpdateModal = (listed) => {
     // Check if the agency is trying to update their own details
-    if (agency.id !== agencyData?.id && agency.agency_id !== agencyData?.agency_id) {
+    if (listed.id !== agencyData?.id && listed.agency_id !== agencyData?.agency_id) {
       setError('You can only update your own agency details');
       return;
     }
+    // The public list has no contact or licence details; take them from our own record
+    const agency = { ...agencyData, ...listed };
     
     setSelectedAgencyForUpdate(agency);
     setUpdateForm({